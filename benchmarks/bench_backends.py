@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Per-frame latency of the keyboard transports (pyusb vs hidraw, mock for reference).
+
+Each backend sends the same static frame repeatedly, so the keyboard does not
+visibly change. Backends that cannot open the device are reported and skipped.
+Note that the pyusb backend detaches the kernel driver, which removes the
+hidraw node until it is re-attached; hidraw is therefore measured first.
+
+Usage: python3 benchmarks/bench_backends.py [--frames N] [--color HEX] [backend ...]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from legion.backends import open_backend  # noqa: E402
+from legion.frames import encode_frame  # noqa: E402
+
+
+def bench(spec, frame, count):
+    try:
+        backend = open_backend(spec)
+    except Exception as e:
+        return f"unavailable ({e})"
+    if not backend.connected:
+        backend.close()
+        return f"device not found ({backend.last_error or 'no matching device'})"
+
+    latencies = []
+    try:
+        for _ in range(count):
+            t0 = time.perf_counter()
+            backend.transfer(frame)
+            latencies.append(time.perf_counter() - t0)
+    except Exception as e:
+        return f"transfer failed ({e})"
+    finally:
+        backend.close()
+
+    latencies.sort()
+    ms = [x * 1000 for x in latencies]
+    total = sum(latencies)
+    return (f"p50 {ms[len(ms) // 2]:7.3f} ms  p95 {ms[int(len(ms) * 0.95) - 1]:7.3f} ms  "
+            f"max {ms[-1]:7.3f} ms  mean {total / len(ms) * 1000:7.3f} ms  {len(ms) / total:8.0f} frames/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--color", default="39c5bb", help="Static color sent during the run")
+    parser.add_argument("backends", nargs="*", default=["hidraw", "pyusb", "mock"])
+    args = parser.parse_args()
+
+    frame = encode_frame("static", [args.color], 1, 1)
+    for spec in args.backends:
+        print(f"{spec:<10} {bench(spec, frame, args.frames)}")
+
+
+if __name__ == "__main__":
+    main()
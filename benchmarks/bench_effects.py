@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: software effect frames per second and CPU%, per-step Python vs legion.batch (NumPy).
+
+The per-step path is the previous calculate_sw_effect logic followed by
+encode_frame, one step at a time. The batched path evaluates and encodes a
+window of steps per call, the way the app streams them. All effects run at
+speed 4, the fastest tick rate. "Scanner ~" is the smooth Scanner rendered
+on the virtual pixel strip, MAX_SUBSTEPS frames per step, against the
+zone-jumping Scanner it replaced.
+
+Usage: python3 benchmarks/bench_effects.py [--frames N] [--window N]
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from legion import batch  # noqa: E402
+from legion.effects import MAX_SUBSTEPS  # noqa: E402
+from legion.frames import encode_frame  # noqa: E402
+
+COLORS = ["39c5bb", "d03a58", "e4d935", "7dbf3b"]
+# Every effect's declared inputs; Battery shows a 3-zone yellow bar
+INPUTS = {"colors": COLORS, "direction": "LTR", "battery": (False, 3, (200, 200, 0), True)}
+SPEED = 4
+
+
+def legacy_calculate_sw_effect(effect, step, colors=COLORS, direction="LTR"):
+    """The previous Legion_KBLight.calculate_sw_effect, minus the Tk variables"""
+    if effect == "Police":
+        if step % 2 == 0:
+            return ["ff0000", "ff0000", "0000ff", "0000ff"]
+        return ["0000ff", "0000ff", "ff0000", "ff0000"]
+    if effect == "Scanner":
+        res = ["000000"] * 4
+        res[[0, 1, 2, 3, 2, 1][step % 6]] = colors[0]
+        return res
+    if effect == "Heartbeat":
+        return list(colors) if step % 4 in (0, 2) else ["000000"] * 4
+    if effect == "Fire":
+        cols = []
+        for _ in range(4):
+            r = random.randint(180, 255)
+            g = random.randint(0, 80)
+            cols.append(f"{r:02x}{g:02x}00")
+        return cols
+    if effect == "Battery":
+        pulse = 0.7 + (0.3 * abs(math.sin(step * 0.2)))
+        active_hex = "%02x%02x%02x" % tuple(int(c * pulse) for c in (200, 200, 0))
+        return [active_hex] * 3 + ["000000"]
+    if effect == "Soft Wave":
+        if direction == "RTL":
+            return [colors[(step + i) % 4] for i in range(4)]
+        return [colors[(step - i) % 4] for i in range(4)]
+    return ["000000"] * 4
+
+
+def run_legacy(effect, frames):
+    for step in range(frames):
+        encode_frame("static", legacy_calculate_sw_effect(effect, step), SPEED, 1)
+
+
+def run_batched(effect, frames, window, substeps=1):
+    for first in range(0, frames, window):
+        rgb = batch.evaluate(effect, first, min(window, frames - first), INPUTS, substeps)
+        batch.encode_frames(rgb, SPEED, 1)
+
+
+def measure(fn, *args):
+    """(frames per second, CPU% of one core) for one run"""
+    wall, cpu = time.perf_counter(), time.process_time()
+    fn(*args)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return args[1] / wall, 100 * cpu / wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--window", type=int, default=batch.FrameStream.WINDOW)
+    args = parser.parse_args()
+
+    if not batch.available():
+        sys.exit("NumPy is not installed; nothing to compare")
+
+    # Sanity check: the deterministic effects agree step for step
+    for effect in ("Police", "Scanner", "Heartbeat", "Soft Wave", "Battery"):
+        rgb = batch.evaluate(effect, 0, 64, INPUTS)
+        for step in range(64):
+            assert batch.hex_zones(rgb[step]) == legacy_calculate_sw_effect(effect, step), (effect, step)
+
+    print(f"{'effect':<12} {'before (f/s)':>14} {'cpu':>6} {'after (f/s)':>14} {'cpu':>6} {'speedup':>8}")
+    for effect in ("Fire", "Battery", "Soft Wave", "Scanner", "Police", "Heartbeat"):
+        before, before_cpu = measure(run_legacy, effect, args.frames)
+        after, after_cpu = measure(run_batched, effect, args.frames, args.window)
+        print(f"{effect:<12} {before:>14,.0f} {before_cpu:>5.0f}% {after:>14,.0f} {after_cpu:>5.0f}% {after / before:>7.1f}x")
+    before, before_cpu = measure(run_legacy, "Scanner", args.frames)
+    after, after_cpu = measure(run_batched, "Scanner", args.frames, args.window, MAX_SUBSTEPS)
+    print(f"{'Scanner ~':<12} {before:>14,.0f} {before_cpu:>5.0f}% {after:>14,.0f} {after_cpu:>5.0f}% {after / before:>7.1f}x")
+
+    # What the app actually pays: CPU time per second of animation at the fastest tick
+    tick_ms = 40
+    per_frame_before = 1 / measure(run_legacy, "Fire", args.frames)[0]
+    per_frame_after = 1 / measure(run_batched, "Fire", args.frames, args.window)[0]
+    print(f"\nFire at {1000 // tick_ms} fps: {per_frame_before * 1000 / tick_ms * 100:.3f}% CPU before,"
+          f" {per_frame_after * 1000 / tick_ms * 100:.3f}% after")
+
+
+if __name__ == "__main__":
+    main()
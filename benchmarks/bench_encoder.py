@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: frames encoded per second, list-based encoder vs legion.frames.
+
+Usage: python3 benchmarks/bench_encoder.py [--frames N]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from legion.frames import EFFECT, encode_frame, pack_rgb  # noqa: E402
+
+
+def legacy_build_control_string(effect, colors=None, speed=1, brightness=1, wave_direction=None):
+    """The previous Legion_KBLight.py implementation, kept verbatim for comparison"""
+    data = [204, 22]
+    if effect == "off":
+        data.append(EFFECT["off"])
+        data += [0]*30
+        return data
+    data.append(EFFECT[effect])
+    data.append(speed)
+    data.append(brightness)
+    if effect not in ["static", "breath"]:
+        data += [0]*12
+    else:
+        chunk = [0, 0, 0]
+        for section in range(4):
+            if colors and section < len(colors) and colors[section].strip():
+                color = colors[section].lower()
+                if re.match(r"^[0-9a-f]{6}$", color):
+                    chunk = [int(color[i:i+2],16) for i in range(0,6,2)]
+                elif "," in color:
+                    components = color.split(",")
+                    if all(c.strip().isdigit() for c in components):
+                        chunk = [max(0,min(255,int(c))) for c in components[:3]]
+                    else:
+                        raise ValueError(f"Invalid RGB format: {color}")
+                else:
+                    raise ValueError(f"Invalid color model: {color}")
+            data += chunk
+    data += [0]
+    if wave_direction is not None:
+        wd = wave_direction.upper()
+        if wd == "RTL":
+            data += [1,0]
+        elif wd == "LTR":
+            data += [0,1]
+        else:
+            data += [0,0]
+    else:
+        data += [0,0]
+    data += [0]*13
+    return data
+
+
+def workloads(frames):
+    """Colour sequences resembling the software effects"""
+    rng = random.Random(0)
+    static = [["39c5bb", "d03a58", "e4d935", "7dbf3b"]] * frames
+    # Fire draws from a bounded palette, so strings repeat between ticks
+    fire = [[f"{rng.randint(180, 255):02x}{rng.randint(0, 80):02x}00" for _ in range(4)] for _ in range(frames)]
+    fire_packed = [[int(c, 16) for c in cols] for cols in fire]
+    scanner = [["000000"] * 4 for _ in range(frames)]
+    for i, cols in enumerate(scanner):
+        cols[[0, 1, 2, 3, 2, 1][i % 6]] = "39c5bb"
+    return {
+        "static": static,
+        "fire": fire,
+        "scanner": scanner,
+        "fire (packed ints)": fire_packed,
+    }
+
+
+def measure(fn, sequence):
+    start = time.perf_counter()
+    for colors in sequence:
+        fn("static", colors, 1, 2, None)
+    return len(sequence) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=100000)
+    args = parser.parse_args()
+
+    # Sanity check: both encoders agree byte for byte
+    for sequence in workloads(64).values():
+        for colors in sequence:
+            if isinstance(colors[0], str):
+                assert bytes(legacy_build_control_string("static", colors, 1, 2)) == encode_frame("static", colors, 1, 2)
+    assert bytes(legacy_build_control_string("wave", None, 3, 1, "RTL")) == encode_frame("wave", None, 3, 1, "RTL")
+    assert encode_frame("static", [pack_rgb(0x39, 0xC5, 0xBB)]) == encode_frame("static", ["39c5bb"])
+
+    print(f"{'workload':<20} {'before (f/s)':>14} {'after (f/s)':>14} {'speedup':>8}")
+    for name, sequence in workloads(args.frames).items():
+        after = measure(encode_frame, sequence)
+        if isinstance(sequence[0][0], int):
+            before_txt, speedup = "n/a", ""
+        else:
+            before = measure(legacy_build_control_string, sequence)
+            before_txt, speedup = f"{before:,.0f}", f"{after / before:.1f}x"
+        print(f"{name:<20} {before_txt:>14} {after:>14,.0f} {speedup:>8}")
+
+
+if __name__ == "__main__":
+    main()
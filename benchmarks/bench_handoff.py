@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Relaunch handoff: time from launching Legion_KBLight.py to the running instance getting "show".
+
+This process plays the running instance: it serves the control socket
+under a private name (LEGION_KB_SOCKET) and answers "show" like the app.
+Each run starts Legion_KBLight.py and records when the request arrives
+(handoff) and when the new process has exited. For reference, the last rows
+show a bare interpreter start and the cost of importing each of the
+app's heavy dependencies, which a relaunch no longer pays.
+
+Usage: python3 benchmarks/bench_handoff.py [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+from legion import ipc  # noqa: E402
+
+NAME = f"legion-kblight-bench-{os.getpid()}"
+HEAVY = ("customtkinter", "PIL.Image", "pystray", "usb.core")
+
+
+def launch(command, env=None):
+    """ms from Popen to exit"""
+    start = time.perf_counter()
+    subprocess.run(command, env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="Launches to time")
+    args = parser.parse_args()
+
+    received = []
+    server = ipc.ControlServer(lambda commands: received.append(time.perf_counter()) or [{"window": True}],
+                               "\0" + NAME)
+    if not server.start(): sys.exit("could not bind the benchmark socket")
+    env = {**os.environ, "LEGION_KB_SOCKET": NAME}
+    command = [sys.executable, os.path.join(ROOT, "Legion_KBLight.py")]
+
+    handoff, total = [], []
+    for _ in range(args.runs):
+        count = len(received)
+        start = time.perf_counter()
+        subprocess.run(command, env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        total.append((time.perf_counter() - start) * 1000)
+        if len(received) == count: sys.exit("the relaunch did not hand off to the running instance")
+        handoff.append((received[-1] - start) * 1000)
+    server.close()
+
+    print(f"{'relaunch':<34}{'median ms':>10}{'max ms':>10}")
+    print(f"{'launch -> show received':<34}{statistics.median(handoff):10.1f}{max(handoff):10.1f}")
+    print(f"{'launch -> process exited':<34}{statistics.median(total):10.1f}{max(total):10.1f}")
+    bare = [launch([sys.executable, "-c", "pass"]) for _ in range(args.runs)]
+    print(f"{'python -c pass':<34}{statistics.median(bare):10.1f}{max(bare):10.1f}")
+    for module in HEAVY:
+        probe = subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True)
+        if probe.returncode:
+            print(f"{'import ' + module:<34}{'not installed':>20}")
+            continue
+        runs = [launch([sys.executable, "-c", f"import {module}"]) for _ in range(max(3, args.runs // 4))]
+        print(f"{'import ' + module:<34}{statistics.median(runs):10.1f}{max(runs):10.1f}")
+
+
+if __name__ == "__main__":
+    main()
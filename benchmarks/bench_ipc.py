@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Control socket round trips: command latency and frames per request.
+
+A LightingEngine on the mock backend runs in this process behind a
+ControlServer on a private abstract address, exactly as legiond.py serves
+it. Each row sends the same request many times and reports percentiles of
+the full round trip (request sent to reply read) and how many frames the
+engine sent per request; a batch must cost one frame. "connect + ..." rows
+open a new connection per request, as legionctl.py does. The last row is
+the TCP listener this protocol replaced: connect, send "show", close.
+
+Usage: python3 benchmarks/bench_ipc.py [--requests N]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from legion import ipc  # noqa: E402
+from legion.controller import ControllerGroup  # noqa: E402
+from legion.daemon import EngineTarget  # noqa: E402
+from legion.engine import LightingEngine  # noqa: E402
+
+ADDRESS = f"\0legion-kblight-bench-{os.getpid()}"
+COLORS = ["ff0000", "00ff00", "0000ff", "ffffff"]
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return statistics.median(samples), pick(0.95), pick(0.99)
+
+
+def timed(n, fn):
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def legacy_listener():
+    """The old TCP instance listener, one connection at a time; returns its port"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def listen():
+        while True:
+            conn, _ = server.accept()
+            conn.recv(1024)
+            conn.close()
+
+    threading.Thread(target=listen, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def legacy_show(port):
+    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client.connect(("127.0.0.1", port))
+    client.send(b"show")
+    # The old protocol has no reply: wait for the listener to close the connection
+    client.recv(1)
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per row")
+    args = parser.parse_args()
+
+    controller = ControllerGroup.open("mock", "all")
+    engine = LightingEngine(controller)
+    # No crossfade, so every change is exactly one frame
+    engine.configure({"effect": "static", "colors": COLORS}, {"pref_fade_ms": 0}, force=True)
+    frames = [0]
+    engine.listeners.append(lambda frame: frames.__setitem__(0, frames[0] + 1))
+    server = ipc.ControlServer(EngineTarget(engine), ADDRESS)
+    if not server.start(): sys.exit("could not bind the benchmark address")
+    threading.Thread(target=engine.run, daemon=True).start()
+
+    def palette(i):
+        return [COLORS[(i + k) % 4] for k in range(4)]
+
+    def connect_and_set(i):
+        with ipc.Client(ADDRESS) as fresh:
+            fresh.request({"cmd": "set-colors", "colors": palette(i)})
+
+    client = ipc.Client(ADDRESS)
+    rows = [
+        ("query-state", lambda i: client.request({"cmd": "query-state"})),
+        ("set-colors", lambda i: client.request({"cmd": "set-colors", "colors": palette(i)})),
+        ("set-effect + set-colors", lambda i: client.request(
+            {"cmd": "set-effect", "effect": "static", "level": 100 - i % 2},
+            {"cmd": "set-colors", "colors": palette(i)})),
+        ("connect + set-colors", connect_and_set),
+    ]
+    print(f"{'request':<26}{'p50 us':>9}{'p95 us':>9}{'p99 us':>9}{'frames/req':>12}")
+    for name, fn in rows:
+        fn(1)
+        before = frames[0]
+        samples = timed(args.requests, fn)
+        controller.flush(1.0)
+        p50, p95, p99 = percentiles(samples)
+        print(f"{name:<26}{p50:9.0f}{p95:9.0f}{p99:9.0f}{(frames[0] - before) / args.requests:12.2f}")
+
+    port = legacy_listener()
+    p50, p95, p99 = percentiles(timed(args.requests, lambda i: legacy_show(port)))
+    print(f"{'old TCP show (no reply)':<26}{p50:9.0f}{p95:9.0f}{p99:9.0f}{'-':>12}")
+
+    client.close()
+    engine.stop()
+    server.close()
+    controller.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Resident memory: headless lighting daemon vs the GUI, both running the saved profile.
+
+Each process is started against the mock backend and the repository's
+config.json, left to settle, then VmRSS and whether Tk is mapped are read
+from /proc. The GUI needs a display and its own dependencies; without them
+only the daemon is measured. The GUI is measured with its window up: hiding
+it to the tray keeps the whole widget tree, so the figure is the same.
+
+Usage: python3 benchmarks/bench_rss.py [--settle SECONDS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+from legion.daemon import CONFIG_PATH, active_profile, load_config  # noqa: E402
+
+COMMANDS = {
+    "daemon": [sys.executable, os.path.join(ROOT, "legiond.py"), "--backend", "mock"],
+    "gui": [sys.executable, os.path.join(ROOT, "Legion_KBLight.py"), "--backend", "mock"],
+}
+
+
+def rss_kb(pid):
+    """(VmRSS in KiB, Tk mapped) of a running process"""
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    with open(f"/proc/{pid}/maps") as f:
+        tk = any("libtk" in line or "_tkinter" in line for line in f)
+    return rss, tk
+
+
+def measure(name, settle):
+    """RSS of one process after ``settle`` seconds, or None with the reason it did not stay up"""
+    proc = subprocess.Popen(COMMANDS[name], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=ROOT)
+    try:
+        time.sleep(settle)
+        if proc.poll() is not None:
+            err = proc.stderr.read().decode(errors="replace").strip().splitlines()
+            return None, err[-1] if err else f"exited with {proc.returncode}"
+        return rss_kb(proc.pid), None
+    finally:
+        if proc.poll() is None:
+            proc.terminate()
+            try: proc.wait(5)
+            except subprocess.TimeoutExpired: proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds to run before measuring")
+    args = parser.parse_args()
+
+    print(f"profile effect: {active_profile(load_config(CONFIG_PATH)).get('effect', 'static')}")
+    results = {}
+    for name in COMMANDS:
+        result, error = measure(name, args.settle)
+        if result is None:
+            print(f"{name:<7} not measured: {error}")
+            continue
+        results[name] = result[0]
+        print(f"{name:<7} {result[0] / 1024:8.1f} MiB RSS   Tk {'loaded' if result[1] else 'not loaded'}")
+    if len(results) == 2:
+        print(f"daemon uses {100 * results['daemon'] / results['gui']:.0f}% of the GUI's resident memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Startup: time to the first window, RSS at first paint and the startup stages.
+
+Each run starts Legion_KBLight.py --import-report --startup-report against
+the mock backend and a private control socket, waits for the app's
+"startup:" line (printed once the first window has been drawn), reads the
+process's RSS and stops it. "deferred" is the normal startup; "eager" sets
+LEGION_EAGER_IMPORTS=1 so every module legion.lazy defers is imported up
+front, as before. The deferred imports the app reported (with their cost
+when they did load) and the startup stages up to the first paint
+(legion.startup) are listed at the end, so a stage that got slower stands
+out. Needs a display and the app's dependencies.
+
+Usage: python3 benchmarks/bench_startup.py [--runs N]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+COMMAND = [sys.executable, os.path.join(ROOT, "Legion_KBLight.py"), "--backend", "mock", "--import-report",
+           "--startup-report"]
+MODES = {"deferred": {}, "eager": {"LEGION_EAGER_IMPORTS": "1"}}
+TIMEOUT = 30
+DEFERRED = re.compile(r"deferred import:\s+(\d+) us \|\s+(\d+) modules \| (\S+)")
+STAGE = re.compile(r"startup stage:\s+([\d.]+) ms\s+\+([\d.]+) ms\s+(\S+)")
+
+
+def rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+
+
+def launch(env):
+    """(ms to first window, RSS KiB, report lines) of one start, or None with the reason"""
+    env = {**os.environ, **env, "LEGION_KB_SOCKET": f"legion-kblight-bench-{os.getpid()}"}
+    start = time.perf_counter()
+    proc = subprocess.Popen(COMMAND, env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    lines = []
+    try:
+        for line in proc.stderr:
+            lines.append(line.rstrip())
+            if line.startswith("startup:"):
+                return ((time.perf_counter() - start) * 1000, rss_kb(proc.pid), lines), None
+            if time.perf_counter() - start > TIMEOUT: return None, "no first window within the timeout"
+        return None, lines[-1] if lines else f"exited with {proc.wait()}"
+    finally:
+        proc.terminate()
+        try: proc.wait(5)
+        except subprocess.TimeoutExpired: proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Starts per mode")
+    args = parser.parse_args()
+
+    results = {}
+    deferred = {}
+    stages = {}
+    print(f"{'mode':<10}{'first window ms':>16}{'RSS MiB':>10}")
+    for mode, env in MODES.items():
+        runs = []
+        for _ in range(args.runs):
+            result, error = launch(env)
+            if result is None:
+                print(f"{mode:<10} not measured: {error}")
+                break
+            runs.append(result)
+        if not runs: continue
+        ms = statistics.median(r[0] for r in runs)
+        rss = statistics.median(r[1] for r in runs)
+        results[mode] = (ms, rss)
+        print(f"{mode:<10}{ms:16.0f}{rss / 1024:10.1f}")
+        if mode == "deferred":
+            for _, _, lines in runs:
+                for line in lines:
+                    match = DEFERRED.search(line)
+                    if match: deferred.setdefault(match[3], []).append((int(match[1]), int(match[2])))
+                    match = STAGE.search(line)
+                    if match: stages.setdefault(match[3], []).append((float(match[1]), float(match[2])))
+
+    if len(results) == 2:
+        (lazy_ms, lazy_rss), (eager_ms, eager_rss) = results["deferred"], results["eager"]
+        print(f"deferring saves {eager_ms - lazy_ms:.0f} ms to the first window and {(eager_rss - lazy_rss) / 1024:.1f} MiB at first paint")
+    if deferred:
+        print("deferred imports loaded before the first paint (median):")
+        for name, costs in deferred.items():
+            print(f"  {name:<20}{statistics.median(c[0] for c in costs) / 1000:8.1f} ms {max(c[1] for c in costs):5d} modules")
+    if stages:
+        print("startup stages (median ms since the app module started loading):")
+        for name, times in stages.items():
+            print(f"  {name:<20}at {statistics.median(t[0] for t in times):8.1f}  took {statistics.median(t[1] for t in times):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
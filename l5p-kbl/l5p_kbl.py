@@ -44,9 +44,20 @@
 # UNUSED ........... 00
 #
 
-import re
+import time
 
-import usb.core
+_START = time.perf_counter()
+
+import os  # noqa: E402
+import sys  # noqa: E402
+
+# Shared encoder and transports live in the legion package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from legion.backends import BACKEND_ENV, open_backend  # noqa: E402
+from legion.devices import discover_devices, resolve_targets  # noqa: E402
+from legion.frames import EFFECT, encode_frame  # noqa: E402
+
+_IMPORTED = time.perf_counter()
 
 
 class LedController:
@@ -54,20 +65,19 @@ class LedController:
     # Integrated Technology Express, Inc. ITE Device(8295)
     VENDOR = 0x048D
     PRODUCT = 0xC965
-    EFFECT = {"static": 1, "breath": 3, "wave": 4, "hue": 6}
+    EFFECT = EFFECT
 
-    def __init__(self):
-        device = usb.core.find(idVendor=self.VENDOR, idProduct=self.PRODUCT)
+    def __init__(self, backend=None, product=None):
+        # Backend spec: "auto" (default), "pyusb", "hidraw", "mock:dump=-", ... or $LEGION_KB_BACKEND.
+        # The pyusb backend detaches the kernel driver to prevent
+        # usb.core.USBError: [Errno 16] Resource busy
+        if product is not None:
+            self.PRODUCT = product
+        self.backend = open_backend(backend, self.VENDOR, self.PRODUCT)
 
-        if device is None:
+        if not self.backend.connected:
             raise ValueError("Light device not found")
 
-        # Prevent usb.core.USBError: [Errno 16] Resource busy
-        if device.is_kernel_driver_active(0):
-            device.detach_kernel_driver(0)
-
-        self.device = device
-
     # Build light device control string
     def build_control_string(
         self,
@@ -77,96 +87,17 @@ class LedController:
         brightness=1,
         wave_direction=None,
     ):
-        data = [204, 22]
-
-        if effect == "off":
-            data.append(self.EFFECT["static"])
-            data += [0] * 30
-            return data
-
-        data.append(self.EFFECT[effect])
-        data.append(speed)
-        data.append(brightness)
-
-        if effect not in ["static", "breath"]:
-            data += [0] * 12
-        else:
-            chunk = None
-            for section in range(0, 4):
-
-                if section < len(colors):
-                    color = colors[section].lower()
-
-                    model = None
-                    # Detect color model
-                    if re.match(r"^[0-9a-f]{6}$", color):
-                        # HEX model
-                        chunk = [
-                            int(color[i : i + 2], 16) for i in range(0, len(color), 2)
-                        ]
-                    else:
-                        components = color.split(",")
-
-                        if components[0].isdigit():
-                            # RGB model
-                            components = list(map(lambda c: int(c), components))
-
-                            # Validate RGB input
-                            for component in components:
-                                if not 0 <= component <= 255:
-                                    raise ValueError(
-                                        f"Invalid RGB color model: {color}"
-                                    )
-
-                            chunk = list(components)
-
-                        elif re.match(r"^\d+\.\d+$", components[0]):
-                            # HSV model
-                            components = list(map(lambda c: float(c), components))
-
-                            # Validate HSV input
-                            for component in components:
-                                if not 0 <= component <= 1:
-                                    raise ValueError(
-                                        f"Invalid HSV color model: {color}"
-                                    )
-
-                            from colorsys import hsv_to_rgb
-
-                            chunk = list(
-                                map(lambda c: int(c * 255), hsv_to_rgb(*components))
-                            )
-
-                        else:
-                            raise ValueError(f"Invalid color model: {color}")
-
-                data += chunk
-
-        # Unused
-        data += [0]
-
-        # Wave direction
-        if wave_direction == "rtl":
-            data += [1, 0]
-        elif wave_direction == "ltr":
-            data += [0, 1]
-        else:
-            data += [0, 0]
-
-        # Unused
-        data += [0] * 13
-
-        return data
+        # Header and trailer come from a cached per-effect template, colors
+        # may be strings or packed 0xRRGGBB ints and are decoded only once
+        return encode_frame(effect, colors, speed, brightness, wave_direction)
 
     # Send command to device
     def send_control_string(self, data):
-        self.device.ctrl_transfer(
-            bmRequestType=0x21,
-            bRequest=0x9,
-            wValue=0x03CC,
-            wIndex=0x00,
-            data_or_wLength=data,
-        )
+        if not self.backend.write(bytes(data), attempts=1):
+            raise IOError(f"Light device transfer failed: {self.backend.last_error}")
+
+    def close(self):
+        self.backend.close()
 
 
 # CLI Stuff
@@ -178,6 +109,27 @@ if __name__ == "__main__":
         description="Lenovo Legion 5 Pro 2021 keyboard light controller"
     )
 
+    argparser.add_argument(
+        "--backend",
+        help=f"Device transport: auto (default), pyusb, hidraw, sysfs or mock[:latency=MS,error_rate=P,dump=FILE], also read from {BACKEND_ENV}",
+    )
+
+    argparser.add_argument(
+        "--device",
+        help="Controllers to drive: all (default), an index or a serial, comma separated",
+    )
+    argparser.add_argument(
+        "--list-devices",
+        action="store_true",
+        help="List attached keyboard lighting controllers and exit",
+    )
+
+    argparser.add_argument(
+        "--timing",
+        action="store_true",
+        help="Print how long each stage of the run took",
+    )
+
     effect_subparsers = argparser.add_subparsers(help="Light effect", dest="effect")
 
     # Global options
@@ -236,13 +188,50 @@ if __name__ == "__main__":
 
     args = argparser.parse_args()
 
-    # Use controller
-    controller = LedController()
-    data = controller.build_control_string(
+    if args.list_devices:
+        for device in discover_devices():
+            print(device.label)
+        sys.exit(0)
+
+    # Use one controller per selected device
+    timings = [("import", _IMPORTED - _START)]
+    stage = time.perf_counter()
+    try:
+        controllers = [LedController(spec, device.product if device else None)
+                       for device, spec in resolve_targets(args.backend, args.device)]
+    except ValueError as e:
+        # An unmatched --device, or a mistyped --backend name or option
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    timings.append(("open", time.perf_counter() - stage))
+
+    stage = time.perf_counter()
+    data = controllers[0].build_control_string(
         effect=args.effect,
         colors=getattr(args, "colors", None),
         speed=getattr(args, "speed", 1),
         brightness=getattr(args, "brightness", 1),
         wave_direction=getattr(args, "direction", None),
     )
-    controller.send_control_string(data)
+    timings.append(("encode", time.perf_counter() - stage))
+
+    stage = time.perf_counter()
+    for controller in controllers:
+        controller.send_control_string(data)
+    timings.append(("transfer", time.perf_counter() - stage))
+    for controller in controllers:
+        controller.close()
+
+    if args.timing:
+        for name, seconds in timings:
+            print(f"{name:<10} {seconds * 1000:8.2f} ms", file=sys.stderr)
+        for controller in controllers:
+            backend = controller.backend
+            if backend.lookup_ms is not None:
+                print(
+                    f"{'lookup':<10} {backend.lookup_ms:8.2f} ms"
+                    f" ({backend.lookup_source}, {backend.name})",
+                    file=sys.stderr,
+                )
+        total = time.perf_counter() - _START
+        print(f"{'total':<10} {total * 1000:8.2f} ms", file=sys.stderr)
@@ -0,0 +1,7 @@
+"""
+Legion lighting core
+Shared, Tk-free building blocks for Legion_KBLight.py and l5p-kbl/l5p_kbl.py.
+
+Submodules are imported explicitly by their users so that importing this
+package stays cheap and never pulls in pyusb or GUI toolkits.
+"""
@@ -0,0 +1,575 @@
+"""
+Transports that carry frames to the keyboard light controller.
+
+Every backend keeps its device open for the lifetime of the app and exposes
+the same small interface: ``write`` (send with reconnect), ``transfer`` (one
+raw attempt), ``lock``, ``connected``, ``close`` and ``stats``. Backends are
+meant to be driven from the FrameWriter thread, so reconnect backoff never
+blocks the UI and frames posted meanwhile collapse in the writer's mailbox.
+Reconnecting happens on a send; while idle the controller's periodic resync
+is that send (see LedController._resync), replaying ``last_frame``.
+
+Select one with a spec string, either passed explicitly (``--backend``) or
+through the LEGION_KB_BACKEND environment variable:
+
+    pyusb                                  default, libusb control transfers
+    hidraw                                 HIDIOCSFEATURE on /dev/hidrawN
+    hidraw:node=/dev/hidraw3               skip the sysfs lookup
+    hidraw:port=1-3                        the controller at that USB port
+    sysfs                                  kernel LED class (kbd_backlight)
+    auto                                   pyusb if the ITE controller is present,
+                                           otherwise sysfs if a keyboard LED exists
+    mock:latency=2,error_rate=0.01,dump=frames.log
+"""
+
+import fcntl
+import glob
+import inspect
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+try:
+    import usb.core
+    import usb.util
+except ImportError:
+    usb = None
+
+from legion.frames import EFFECT, ZONES, decode_frame
+
+BACKEND_ENV = "LEGION_KB_BACKEND"
+DEFAULT_BACKEND = "auto"
+LEDS_DIR = "/sys/class/leds"
+USB_DEVICES_DIR = "/sys/bus/usb/devices"
+
+
+class Backend:
+    name = "base"
+    # Exception type that signals a failed transfer / lost device
+    TransferError = OSError
+    # Whether probe results measured through this backend may be cached
+    persist_caps = True
+    BACKOFF_INITIAL = 0.25
+    BACKOFF_MAX = 30.0
+
+    def __init__(self, vendor, product):
+        self.vendor = vendor
+        self.product = product
+        self.last_frame = None
+        self.last_error = None
+        self.reconnects = 0
+        self.failed_transfers = 0
+        # How the device was located on the last open ("port", "scan", ...) and how long it took
+        self.lookup_source = None
+        self.lookup_ms = None
+        # Held for each transfer; a probe holds it for its whole run
+        self.lock = threading.Lock()
+        self._closed = threading.Event()
+
+    @property
+    def connected(self):
+        raise NotImplementedError
+
+    def open(self):
+        """Acquire the device. Returns True on success"""
+        raise NotImplementedError
+
+    def transfer(self, frame):
+        """Send one frame without retries; raises TransferError"""
+        raise NotImplementedError
+
+    def release(self):
+        """Drop the device handle (it is reopened on the next write)"""
+        raise NotImplementedError
+
+    def write(self, frame, attempts=None):
+        """Send one frame, reconnecting until it goes through or the backend is closed.
+
+        ``attempts`` bounds the number of tries for callers that must not block.
+        """
+        self.last_frame = frame
+        delay = self.BACKOFF_INITIAL
+        while not self._closed.is_set():
+            if self.connected or self._reopen():
+                try:
+                    with self.lock:
+                        self.transfer(frame)
+                    return True
+                except self.TransferError as e:
+                    self.failed_transfers += 1
+                    self.last_error = e
+                    self.release()
+
+            if attempts is not None:
+                attempts -= 1
+                if attempts <= 0: break
+            self._closed.wait(delay)
+            delay = min(delay * 2, self.BACKOFF_MAX)
+        return False
+
+    def _reopen(self):
+        if not self.open(): return False
+        self.reconnects += 1
+        return True
+
+    def close(self):
+        """Abort any pending backoff and drop the handle"""
+        self._closed.set()
+        self.release()
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "failed_transfers": self.failed_transfers,
+        }
+
+
+def _read(path):
+    with open(path, "r") as f:
+        return f.read().strip()
+
+
+def _usb_location(port, vendor, product):
+    """(bus, address) of the controller at a USB port path, None if the port holds something else"""
+    sysfs = os.path.join(USB_DEVICES_DIR, port)
+    try:
+        if int(_read(os.path.join(sysfs, "idVendor")), 16) != vendor: return None
+        if int(_read(os.path.join(sysfs, "idProduct")), 16) != product: return None
+        # The address changes on every replug, the port path does not
+        return int(_read(os.path.join(sysfs, "busnum"))), int(_read(os.path.join(sysfs, "devnum")))
+    except (OSError, ValueError):
+        return None
+
+
+def _device_at(bus, address, vendor, product):
+    """Build a Device only for the entry at bus/address (libusb still lists the whole bus)"""
+    import usb.backend.libusb1
+
+    backend = usb.backend.libusb1.get_backend()
+    if backend is None: return None
+    for dev in backend.enumerate_devices():
+        desc = backend.get_device_descriptor(dev)
+        if desc.bus == bus and desc.address == address:
+            if desc.idVendor == vendor and desc.idProduct == product:
+                return usb.core.Device(dev, backend)
+            return None
+    return None
+
+
+def find_usb_device(vendor, product, port=None):
+    """Return (device or None, "port" | "scan").
+
+    With ``port`` only the device at that USB port path is considered, which
+    is how one of several attached controllers is addressed.
+    """
+    if port:
+        location = _usb_location(port, vendor, product)
+        return (_device_at(*location, vendor, product) if location else None), "port"
+    return usb.core.find(idVendor=vendor, idProduct=product), "scan"
+
+
+class UsbSession(Backend):
+    """pyusb handle; the kernel driver is detached and the interface claimed once per connection"""
+    name = "pyusb"
+
+    def __init__(self, vendor, product, interface=0, port=None):
+        if usb is None:
+            raise ImportError("pyusb is required for the pyusb backend")
+        super().__init__(vendor, product)
+        self.TransferError = usb.core.USBError
+        self.interface = int(interface)
+        # USB port path ("1-3") pinning this session to one of several controllers
+        self.port = port
+        self.device = None
+        self.open()
+
+    @property
+    def connected(self):
+        return self.device is not None
+
+    def open(self):
+        try:
+            start = time.perf_counter()
+            device, self.lookup_source = find_usb_device(self.vendor, self.product, port=self.port)
+            self.lookup_ms = (time.perf_counter() - start) * 1000
+            if device is None: return False
+
+            # Prevent usb.core.USBError: [Errno 16] Resource busy
+            if device.is_kernel_driver_active(self.interface):
+                device.detach_kernel_driver(self.interface)
+            usb.util.claim_interface(device, self.interface)
+        except (usb.core.USBError, usb.core.NoBackendError) as e:
+            self.last_error = e
+            return False
+
+        self.device = device
+        return True
+
+    def transfer(self, frame):
+        self.device.ctrl_transfer(bmRequestType=0x21, bRequest=0x9, wValue=0x03CC, wIndex=0x00, data_or_wLength=frame)
+
+    def release(self):
+        device, self.device = self.device, None
+        if device is None: return
+        try:
+            usb.util.release_interface(device, self.interface)
+        except usb.core.USBError:
+            pass
+        usb.util.dispose_resources(device)
+
+
+def _hidiocsfeature(length):
+    # _IOC(_IOC_WRITE | _IOC_READ, 'H', 0x06, length) from linux/hidraw.h
+    return (3 << 30) | (length << 16) | (ord("H") << 8) | 0x06
+
+
+def find_hidraw_nodes(vendor, product, port=None):
+    """Return /dev/hidrawN paths whose HID device matches vendor/product (and sits at USB ``port``).
+
+    Nodes whose report descriptor declares report ID 0xCC (the lighting
+    feature report) come first, then lower USB interface numbers.
+    """
+    hid_id = f"0003:{vendor:08X}:{product:08X}"
+    found = []
+    for sys_node in glob.glob("/sys/class/hidraw/hidraw*"):
+        try:
+            with open(os.path.join(sys_node, "device", "uevent"), "r") as f:
+                if f"HID_ID={hid_id}" not in f.read().upper(): continue
+        except OSError:
+            continue
+
+        try:
+            with open(os.path.join(sys_node, "device", "report_descriptor"), "rb") as f:
+                # Global item "Report ID" (0x85) with value 0xCC
+                has_report = b"\x85\xcc" in f.read()
+        except OSError:
+            has_report = False
+
+        # .../1-3:1.0/0003:048D:C965.0001 -> port 1-3, interface 0
+        interface_dir = os.path.basename(os.path.dirname(os.path.realpath(os.path.join(sys_node, "device"))))
+        if port and interface_dir.split(":")[0] != port: continue
+        try:
+            interface = int(interface_dir.rsplit(".", 1)[1])
+        except (IndexError, ValueError):
+            interface = 99
+        found.append((not has_report, interface, "/dev/" + os.path.basename(sys_node)))
+
+    return [node for _, _, node in sorted(found)]
+
+
+class HidrawBackend(Backend):
+    """Feature reports through the kernel hidraw driver; no detaching, no libusb"""
+    name = "hidraw"
+
+    def __init__(self, vendor, product, node=None, port=None):
+        super().__init__(vendor, product)
+        self.node = node
+        # USB port path ("1-3"): the node is looked up again on every reconnect, as it may change
+        self.port = port
+        self.path = None
+        self.fd = None
+        self.open()
+
+    @property
+    def connected(self):
+        return self.fd is not None
+
+    def open(self):
+        start = time.perf_counter()
+        if self.node:
+            opened = self._open_first([self.node], "explicit")
+        else:
+            nodes = find_hidraw_nodes(self.vendor, self.product, self.port)
+            opened = self._open_first(nodes, "port" if self.port else "scan")
+        self.lookup_ms = (time.perf_counter() - start) * 1000
+        return opened
+
+    def _open_first(self, nodes, source):
+        for node in nodes:
+            try:
+                self.fd = os.open(node, os.O_RDWR | os.O_CLOEXEC)
+            except OSError as e:
+                self.last_error = e
+                continue
+            self.path, self.lookup_source = node, source
+            return True
+        return False
+
+    def transfer(self, frame):
+        # The first byte of the frame (0xCC) doubles as the report ID
+        fcntl.ioctl(self.fd, _hidiocsfeature(len(frame)), bytes(frame))
+
+    def release(self):
+        fd, self.fd = self.fd, None
+        if fd is None: return
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+def find_kbd_leds(leds_dir=None):
+    """Return sysfs directories of keyboard backlight LEDs, in zone order"""
+    leds_dir = leds_dir or LEDS_DIR
+    def natural(path):
+        return [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", os.path.basename(path))]
+    leds = [p for p in glob.glob(os.path.join(leds_dir, "*"))
+            if "kbd_backlight" in os.path.basename(p) or "kbd_zoned_backlight" in os.path.basename(p)]
+    return sorted(leds, key=natural)
+
+
+class SysfsLed:
+    """One LED class device with persistent descriptors for its writable attributes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "max_brightness"), "r") as f:
+            self.max_brightness = int(f.read().strip())
+
+        # Multicolor LEDs list their channel order, e.g. "red green blue"
+        self.channels = None
+        index_path = os.path.join(path, "multi_index")
+        if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                self.channels = f.read().split()
+
+        self.brightness_fd = os.open(os.path.join(path, "brightness"), os.O_WRONLY | os.O_CLOEXEC)
+        self.intensity_fd = None
+        if self.channels:
+            self.intensity_fd = os.open(os.path.join(path, "multi_intensity"), os.O_WRONLY | os.O_CLOEXEC)
+
+    @property
+    def is_rgb(self):
+        return bool(self.channels) and {"red", "green", "blue"} <= set(self.channels)
+
+    def writes_for(self, color, level):
+        """(fd, payload) pairs that show ``color`` at ``level`` (0.0-1.0)"""
+        r, g, b = (color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF
+        if self.is_rgb:
+            lookup = {"red": r, "green": g, "blue": b}
+            # Intensities are relative to max_brightness, brightness scales all channels
+            intensity = " ".join(str(lookup.get(c, 0) * self.max_brightness // 255) for c in self.channels)
+            value = round(self.max_brightness * level) if color else 0
+            return [(self.intensity_fd, intensity.encode()), (self.brightness_fd, str(value).encode())]
+
+        # Single colour backlight: only the brightest channel survives
+        value = round(self.max_brightness * level * max(r, g, b) / 255)
+        if color and level and not value: value = 1
+        return [(self.brightness_fd, str(value).encode())]
+
+    def close(self):
+        for fd in (self.brightness_fd, self.intensity_fd):
+            if fd is None: continue
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.brightness_fd = self.intensity_fd = None
+
+
+class SysfsLedBackend(Backend):
+    """Kernel LED class keyboard backlight (ideapad_laptop, legion-laptop, ...).
+
+    Capabilities are detected when the LEDs are opened: four LEDs are driven
+    as one zone each, otherwise every LED shows the whole keyboard. RGB needs
+    a multicolor LED (multi_intensity); plain LEDs only get a brightness.
+    Each frame becomes one batch of writes to already-open descriptors, and
+    attributes whose value did not change are not written again. Firmware
+    effects (wave, hue) cannot be expressed here and keep the current colours.
+    """
+    name = "sysfs"
+
+    def __init__(self, vendor, product, leds=None):
+        super().__init__(vendor, product)
+        # Optional '+'-separated LED names, e.g. leds=platform::kbd_backlight
+        self.led_names = leds.split("+") if leds else None
+        self.leds = []
+        self.colors = [0] * ZONES
+        self._written = {}
+        self.open()
+
+    @property
+    def connected(self):
+        return bool(self.leds)
+
+    def capabilities(self):
+        return {
+            "leds": [led.name for led in self.leds],
+            "zones": ZONES if len(self.leds) == ZONES else 1,
+            "rgb": bool(self.leds) and all(led.is_rgb for led in self.leds),
+        }
+
+    def open(self):
+        if self.led_names:
+            paths = [os.path.join(LEDS_DIR, name) for name in self.led_names]
+        else:
+            paths = find_kbd_leds()
+        leds = []
+        try:
+            for path in paths:
+                leds.append(SysfsLed(path))
+        except (OSError, ValueError) as e:
+            self.last_error = e
+            for led in leds: led.close()
+            return False
+        self.leds = leds
+        self._written = {}
+        return bool(leds)
+
+    def transfer(self, frame):
+        effect, _, brightness, colors = decode_frame(frame)
+        if effect in (EFFECT["static"], EFFECT["breath"]):
+            self.colors = colors
+        # Hardware brightness is 1 (Low) or 2 (High)
+        level = min(max(brightness, 1), 2) / 2
+
+        if len(self.leds) == ZONES:
+            targets = zip(self.leds, self.colors)
+        else:
+            # One LED for the whole keyboard: show the brightest zone
+            brightest = max(self.colors, key=lambda c: max(c >> 16, (c >> 8) & 0xFF, c & 0xFF))
+            targets = ((led, brightest) for led in self.leds)
+
+        batch = []
+        for led, color in targets:
+            batch.extend(led.writes_for(color, level))
+        for fd, payload in batch:
+            if self._written.get(fd) == payload: continue
+            os.pwrite(fd, payload, 0)
+            self._written[fd] = payload
+
+    def release(self):
+        leds, self.leds = self.leds, []
+        for led in leds: led.close()
+        self._written = {}
+
+    def stats(self):
+        data = super().stats()
+        data.update(self.capabilities())
+        return data
+
+
+def open_auto_backend(vendor, product):
+    """pyusb when the ITE controller is attached, LED class when only that exists"""
+    if not find_kbd_leds():
+        return UsbSession(vendor, product)
+    try:
+        backend = UsbSession(vendor, product)
+        if backend.connected: return backend
+        backend.close()
+    except ImportError:
+        pass
+    return SysfsLedBackend(vendor, product)
+
+
+class MockTransferError(OSError):
+    pass
+
+
+class MockBackend(Backend):
+    """Records frames instead of sending them, for tests and benchmarks without the keyboard.
+
+    latency     simulated milliseconds per transfer
+    jitter      extra random milliseconds (uniform 0..jitter)
+    error_rate  probability that a transfer fails and forces a reconnect
+    dump        file the recorded stream is written to on close ("-" = stdout)
+    """
+    name = "mock"
+    TransferError = MockTransferError
+    persist_caps = False
+
+    def __init__(self, vendor, product, latency=0.0, jitter=0.0, error_rate=0.0, dump=None, seed=None):
+        super().__init__(vendor, product)
+        self.latency = float(latency) / 1000.0
+        self.jitter = float(jitter) / 1000.0
+        self.error_rate = float(error_rate)
+        self.dump_path = dump
+        self.frames = []
+        # Number of upcoming transfers that fail regardless of error_rate
+        self.fail_next = 0
+        self._random = random.Random(seed)
+        self._connected = False
+        self.open()
+
+    @property
+    def connected(self):
+        return self._connected
+
+    def open(self):
+        self._connected = True
+        return True
+
+    def transfer(self, frame):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay: time.sleep(delay)
+        if self.fail_next > 0 or (self.error_rate and self._random.random() < self.error_rate):
+            self.fail_next = max(0, self.fail_next - 1)
+            raise MockTransferError("injected transfer error")
+        self.frames.append((time.monotonic(), bytes(frame)))
+
+    def release(self):
+        self._connected = False
+
+    def dump(self, fp):
+        """Write the recorded stream as '<seconds since first frame> <frame hex>' lines"""
+        start = self.frames[0][0] if self.frames else 0.0
+        for t, frame in self.frames:
+            fp.write(f"{t - start:.6f} {frame.hex()}\n")
+
+    def close(self):
+        super().close()
+        if not self.dump_path: return
+        if self.dump_path == "-":
+            self.dump(sys.stdout)
+            return
+        try:
+            with open(self.dump_path, "w") as f:
+                self.dump(f)
+        except OSError as e:
+            print(f"Could not write mock frame dump: {e}")
+
+    def stats(self):
+        data = super().stats()
+        data["frames_recorded"] = len(self.frames)
+        return data
+
+
+BACKENDS = {
+    UsbSession.name: UsbSession,
+    HidrawBackend.name: HidrawBackend,
+    SysfsLedBackend.name: SysfsLedBackend,
+    MockBackend.name: MockBackend,
+}
+
+
+def parse_backend_spec(spec):
+    """Split 'name:key=value,key=value' into (name, options)"""
+    name, _, opts = spec.partition(":")
+    options = {}
+    for item in filter(None, opts.split(",")):
+        key, _, value = item.partition("=")
+        options[key.strip()] = value.strip()
+    return name.strip() or DEFAULT_BACKEND, options
+
+
+def open_backend(spec=None, vendor=0x048D, product=0xC965):
+    """Create the backend named by ``spec``, LEGION_KB_BACKEND or the default"""
+    spec = spec or os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND
+    name, options = parse_backend_spec(spec)
+    if name == "auto":
+        if options: raise ValueError(f"Backend 'auto' takes no options (got {', '.join(options)})")
+        return open_auto_backend(vendor, product)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}' (choose from auto, {', '.join(BACKENDS)})")
+    cls = BACKENDS[name]
+    accepted = list(inspect.signature(cls.__init__).parameters)[3:] # after self, vendor, product
+    for key in options:
+        if key not in accepted:
+            raise ValueError(f"Unknown option '{key}' for backend '{name}' (choose from {', '.join(accepted)})")
+    return cls(vendor, product, **options)
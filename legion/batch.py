@@ -0,0 +1,151 @@
+"""
+Vectorized evaluation of software effects (optional, needs NumPy).
+
+Instead of computing one zone of one step at a time, a whole window of steps
+is produced by a single call as an (N, 4, 3) uint8 array. A row's 12 bytes
+are exactly the colour section of a control frame, so encoding a step is a
+slice copy into the effect's frame template.
+
+FrameStream keeps such a window for the running effect and refills it when
+the timeline moves past its end. Every registered effect has a vectorized
+counterpart here. Without NumPy ``available()`` is False and callers fall
+back to legion.effects.
+"""
+
+from legion import canvas
+from legion.frames import COLOR_OFFSET, ZONES, decode_color, frame_template
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+COLOR_END = COLOR_OFFSET + ZONES * 3
+
+def available():
+    return np is not None
+
+
+def zone_array(colors):
+    """(4, 3) uint8 array from four colour strings or packed ints"""
+    packed = [c if isinstance(c, int) else decode_color(c) for c in colors]
+    return np.array([((c >> 16) & 0xFF, (c >> 8) & 0xFF, c & 0xFF) for c in packed], dtype=np.uint8)
+
+
+def police(positions, inputs):
+    red, blue = (255, 0, 0), (0, 0, 255)
+    patterns = np.array([[red, red, blue, blue], [blue, blue, red, red]], dtype=np.uint8)
+    return patterns[np.floor(positions).astype(int) % 2]
+
+
+def scanner(positions, inputs):
+    """One zone wide bar on the virtual strip, downsampled to the zones"""
+    pixels = canvas.PIXELS
+    p = positions % 6
+    centers = (np.where(p <= 3, p, 6 - p) + 0.5) * pixels / ZONES
+    x = np.arange(pixels)
+    half = pixels / ZONES / 2
+    cover = np.clip(np.minimum(centers[:, None] + half, x + 1) - np.maximum(centers[:, None] - half, x), 0, None)
+    strips = cover[..., None] * zone_array(inputs["colors"])[0].astype(np.float32)
+    return canvas.downsample_batch(strips)
+
+
+def heartbeat(positions, inputs):
+    lit = np.isin(np.floor(positions).astype(int) % 4, (0, 2))
+    return np.where(lit[:, None, None], zone_array(inputs["colors"]), 0).astype(np.uint8)
+
+
+def soft_wave(positions, inputs):
+    """The zone colours sliding along the virtual strip, downsampled to the zones"""
+    u = np.asarray(canvas.zone_units())
+    if inputs.get("direction") == "RTL":
+        idx = np.floor(positions[:, None] + u).astype(int) % ZONES
+    else:
+        idx = np.ceil(positions[:, None] - u).astype(int) % ZONES
+    return canvas.downsample_batch(zone_array(inputs["colors"]).astype(np.float32)[idx])
+
+
+def fire(positions, inputs, rng=None):
+    """Random orange/red flicker, one draw for the whole window"""
+    rng = rng or np.random.default_rng()
+    out = np.zeros((len(positions), ZONES, 3), dtype=np.uint8)
+    out[..., 0] = rng.integers(180, 256, (len(positions), ZONES))
+    out[..., 1] = rng.integers(0, 81, (len(positions), ZONES))
+    return out
+
+
+def battery(positions, inputs):
+    """Battery bar: lit zones of the base colour with a slow pulse, or the low-battery blink"""
+    warning, count, base_rgb, pulsing = inputs["battery"]
+    out = np.zeros((len(positions), ZONES, 3), dtype=np.uint8)
+    if warning:
+        out[np.floor(positions).astype(int) % 2 == 0] = (255, 0, 0)
+        return out
+    pulse = 0.7 + 0.3 * np.abs(np.sin(positions * 0.2)) if pulsing else np.ones(len(positions))
+    out[:, :count] = (np.asarray(base_rgb, dtype=np.float64)[None, :] * pulse[:, None]).astype(np.uint8)[:, None, :]
+    return out
+
+
+def fade(start, end, n):
+    """Linear crossfade from one set of zone colours to another over ``n`` steps"""
+    a = zone_array(start).astype(np.float32)
+    b = zone_array(end).astype(np.float32)
+    w = np.linspace(0.0, 1.0, n, dtype=np.float32)[:, None, None]
+    return np.rint(a + (b - a) * w).astype(np.uint8)
+
+
+EFFECTS = {
+    "Police": police,
+    "Scanner": scanner,
+    "Heartbeat": heartbeat,
+    "Soft Wave": soft_wave,
+    "Fire": fire,
+    "Battery": battery,
+}
+
+
+def evaluate(effect, first_step, n, inputs=None, substeps=1):
+    """Zone colours of ``n`` consecutive timeline steps as an (n, 4, 3) uint8 array.
+
+    ``inputs`` are the effect's declared dependencies, as for legion.effects.
+    Smooth effects render ``substeps`` timeline steps per effect step.
+    """
+    positions = np.arange(first_step, first_step + n) / substeps
+    return EFFECTS[effect](positions, inputs or {})
+
+
+def encode_frames(rgb, speed=1, brightness=1):
+    """Static-mode control frames for every row of an (n, 4, 3) array"""
+    template = frame_template("static", speed, brightness)
+    head, tail = template[:COLOR_OFFSET], template[COLOR_END:]
+    return [head + row + tail for row in map(bytes, rgb.reshape(len(rgb), -1))]
+
+
+def hex_zones(row):
+    """Zone colours of one array row as hex strings (for the preview)"""
+    h = row.tobytes().hex()
+    return [h[i:i + 6] for i in range(0, ZONES * 6, 6)]
+
+
+class FrameStream:
+    """A window of precomputed steps of one effect, refilled in a single call when exhausted"""
+    WINDOW = 64
+
+    def __init__(self, effect, inputs=None, speed=1, brightness=1, substeps=1):
+        self.effect = effect
+        self.inputs = inputs or {}
+        self.substeps = substeps
+        self.speed = speed
+        self.brightness = brightness
+        self.first = None
+        self.rgb = None
+        self.frames = []
+
+    def __getitem__(self, step):
+        """(zone colours, frame) of a timeline step"""
+        if self.first is None or not self.first <= step < self.first + len(self.frames):
+            self.first = step
+            self.rgb = evaluate(self.effect, step, self.WINDOW, self.inputs, self.substeps)
+            self.frames = encode_frames(self.rgb, self.speed, self.brightness)
+        i = step - self.first
+        return hex_zones(self.rgb[i]), self.frames[i]
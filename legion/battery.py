@@ -0,0 +1,97 @@
+"""
+Battery readout from sysfs and the Battery effect's gauge, shared by the GUI and the daemon.
+"""
+
+import os
+
+BATTERY_PATH = "/sys/class/power_supply/BAT0/"
+# Battery effect thresholds (percent): low warning, green bar, full bar
+DEFAULT_THRESHOLDS = (15, 75, 95)
+
+
+def _read(path):
+    with open(path, "r") as f:
+        return f.read().strip()
+
+
+def read_battery(base=BATTERY_PATH):
+    """Get detailed battery data as a dictionary"""
+    data = {
+        "capacity": 0,
+        "status": "Unknown",
+        "wattage": 0.0,
+        "time_str": "",
+        "icon": "🔋"
+    }
+    try:
+        # Capacity
+        if os.path.exists(base + "capacity"):
+            data["capacity"] = int(_read(base + "capacity"))
+
+        # Energy Values (Wh)
+        e_now = int(_read(base + "energy_now")) if os.path.exists(base + "energy_now") else 0
+        e_full = int(_read(base + "energy_full")) if os.path.exists(base + "energy_full") else 0
+        e_design = int(_read(base + "energy_full_design")) if os.path.exists(base + "energy_full_design") else 0
+
+        data["energy_now_wh"] = e_now / 1000000.0
+        data["energy_full_wh"] = e_full / 1000000.0
+        data["energy_design_wh"] = e_design / 1000000.0
+        data["health"] = (e_full / e_design) * 100 if e_design > 0 else 0
+
+        # Status
+        if os.path.exists(base + "status"):
+            data["status"] = _read(base + "status")
+
+        # Power / Wattage
+        if os.path.exists(base + "power_now"):
+            data["wattage"] = int(_read(base + "power_now")) / 1000000.0
+
+        # Time Remaining Calculation
+        if data["wattage"] > 0.1:
+            power_val = int(data["wattage"] * 1000000)
+            hours = None
+            if data["status"] == "Discharging":
+                hours, suffix = e_now / power_val, "remaining"
+            elif data["status"] == "Charging" and e_full - e_now > 0:
+                hours, suffix = (e_full - e_now) / power_val, "until full"
+            if hours is not None:
+                h = int(hours)
+                m = int((hours - h) * 60)
+                data["time_str"] = f"Est: {h}h {m}m {suffix}"
+
+        # Icon logic
+        if data["status"] == "Charging": data["icon"] = "⚡"
+        elif data["capacity"] < 20: data["icon"] = "🪫"
+        return data
+    except (OSError, ValueError):
+        return data
+
+
+def battery_bar(data, thresholds=DEFAULT_THRESHOLDS):
+    """Battery effect state: (low warning blink, lit zones, base rgb, pulsing)"""
+    low_thresh, green_thresh, full_thresh = thresholds
+    try:
+        p = float(data.get("capacity", 0))
+        status = data.get("status", "Unknown")
+    except (TypeError, ValueError):
+        p, status = 0, "Unknown"
+
+    # CRITICAL WARNING:
+    if p <= low_thresh:
+        if status != "Charging":
+            return True, 0, (255, 0, 0), False
+        # Charging: Solid Zone 1 Red (acknowledgement)
+        return False, 1, (255, 0, 0), False
+
+    # Calculate how many zones to light up (Progress Bar)
+    count = 1
+    if p >= full_thresh: count = 4
+    elif p >= 50: count = 3
+    elif p >= 25: count = 2
+
+    # Color scaling: Green (Full) -> Yellow (Half) -> Red (Low)
+    if p >= green_thresh: base_col = (0, 255, 0)      # Green
+    elif p >= 45: base_col = (200, 200, 0) # Yellow-Gold
+    elif p >= 20: base_col = (255, 120, 0) # Orange
+    else: base_col = (255, 0, 0)         # Red
+    return False, count, base_col, True
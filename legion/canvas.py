@@ -0,0 +1,84 @@
+"""
+Virtual pixel strip for smooth software effects.
+
+The keyboard only has four zones, so an effect that moves whole zones jumps.
+Smooth effects instead draw onto a strip of PIXELS virtual pixels, at
+sub-zone positions, and every frame is box-filtered down to the four zones:
+each zone becomes the average of the pixels it covers. The filter is a
+(zones x pixels) weight matrix built once, so with NumPy a whole batch of
+frames is downsampled by a single matrix product. Without NumPy the same
+weights are applied in plain Python, which is only ever done while
+precomputing a frame table.
+"""
+
+from functools import lru_cache
+
+from legion.frames import ZONES
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+PIXELS = 64
+
+
+@lru_cache(maxsize=8)
+def weights(pixels=PIXELS, zones=ZONES):
+    """Box filter: row z holds the share of each pixel in zone z (rows sum to 1)"""
+    rows = []
+    for z in range(zones):
+        lo, hi = z * pixels / zones, (z + 1) * pixels / zones
+        rows.append(tuple(max(0.0, min(hi, x + 1) - max(lo, x)) / (hi - lo) for x in range(pixels)))
+    return np.array(rows, dtype=np.float32) if np is not None else tuple(rows)
+
+
+def coverage(center, width, pixels=PIXELS):
+    """Anti-aliased intensity (0..1) of each pixel under a box of ``width`` pixels at ``center``"""
+    lo, hi = center - width / 2, center + width / 2
+    return [max(0.0, min(hi, x + 1) - max(lo, x)) for x in range(pixels)]
+
+
+def downsample(strip):
+    """Zone colours ((r, g, b) ints) of one strip given as a list of (r, g, b) pixels"""
+    out = []
+    for row in weights(len(strip)):
+        out.append(tuple(int(round(sum(w * p[c] for w, p in zip(row, strip) if w))) for c in range(3)))
+    return out
+
+
+def downsample_batch(strips):
+    """(frames, pixels, 3) strips -> (frames, zones, 3) uint8 zone colours in one product"""
+    return np.rint(weights(strips.shape[-2]) @ strips).astype(np.uint8)
+
+
+def zone_units(pixels=PIXELS):
+    """Centre of each pixel in zone units (0..ZONES)"""
+    return [(x + 0.5) * ZONES / pixels for x in range(pixels)]
+
+
+# --- Shapes shared by the scalar (legion.effects) and batched (legion.batch) effects ---
+
+def scanner_center(position):
+    """Centre (zone units) of the scanner bar ``position`` steps into its 0,1,2,3,2,1 bounce"""
+    p = position % 6
+    return (p if p <= 3 else 6 - p) + 0.5
+
+
+def scanner_strip(position, rgb, pixels=PIXELS):
+    """One zone wide bar of ``rgb`` at its sub-zone position"""
+    cover = coverage(scanner_center(position) * pixels / ZONES, pixels / ZONES, pixels)
+    return [tuple(c * k for c in rgb) for k in cover]
+
+
+def wave_strip(position, rgbs, rtl=False, pixels=PIXELS):
+    """The four zone colours laid out on the strip and shifted by ``position`` zones.
+
+    At whole positions this equals the zone-by-zone rotation of Soft Wave;
+    in between, the downsampled zones blend the two colours under them.
+    """
+    out = []
+    for u in zone_units(pixels):
+        i = int(position + u) if rtl else -int(-(position - u) // 1)
+        out.append(rgbs[i % len(rgbs)])
+    return out
@@ -0,0 +1,182 @@
+"""
+Per-zone effects, composed from layers into one 4-zone frame per tick.
+
+The "Layers" effect stacks any number of layers, bottom first. Each layer
+runs one effect ("static" for the plain zone colours, or any registered
+software effect) on a set of zones, and is blended onto the layers below
+with a blend mode and an alpha. The result is one set of zone colours, and
+so a single control frame per tick whatever the number of layers.
+
+Static layers, and the stack as a whole when nothing in it moves, are
+cached per set of inputs. Only animated layers are evaluated again on every
+tick, each at the shared elapsed time with its own step durations. The
+composed effect ticks at the rate of its fastest layer.
+
+Layers are kept in profiles as dicts (see Layer.to_dict), e.g.
+``{"effect": "Fire", "zones": [0, 1]}`` under
+``{"effect": "Battery", "zones": [3]}``.
+"""
+
+from legion import effects
+from legion.frames import ZONES, decode_color, unpack_rgb
+from legion.timeline import SKIP
+
+LAYERS = "Layers"
+STATIC = "static"
+BLACK = (0, 0, 0)
+# A fresh stack: the zone colours, as the static effect shows them
+DEFAULT_LAYERS = ({"effect": STATIC, "zones": list(range(ZONES))},)
+
+# Blend modes: (lower channel, layer channel) -> channel, before alpha
+BLENDS = {
+    "normal": lambda b, s: s,
+    "add": lambda b, s: min(255, b + s),
+    "multiply": lambda b, s: b * s / 255,
+    "screen": lambda b, s: 255 - (255 - b) * (255 - s) / 255,
+    "lighten": max,
+    "darken": min,
+}
+
+
+class Layer:
+    """One effect on a set of zones; ``colors`` and ``speed`` default to the app's settings"""
+
+    def __init__(self, effect=STATIC, zones=range(ZONES), blend="normal", alpha=1.0, colors=None, speed=None):
+        if effect != STATIC and effect not in effects.REGISTRY:
+            raise ValueError(f"Unknown layer effect '{effect}'")
+        if blend not in BLENDS:
+            raise ValueError(f"Unknown blend mode '{blend}' (choose from {', '.join(BLENDS)})")
+        self.effect = effect
+        self.zones = tuple(sorted(z for z in set(zones) if 0 <= z < ZONES))
+        self.blend = blend
+        self.alpha = max(0.0, min(1.0, float(alpha)))
+        self.colors = list(colors) if colors else None
+        self.speed = speed
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        data = {"effect": self.effect, "zones": list(self.zones)}
+        if self.blend != "normal": data["blend"] = self.blend
+        if self.alpha != 1.0: data["alpha"] = self.alpha
+        if self.colors: data["colors"] = self.colors
+        if self.speed is not None: data["speed"] = self.speed
+        return data
+
+    @property
+    def spec(self):
+        return effects.REGISTRY.get(self.effect)
+
+    @property
+    def opaque(self):
+        """Hides whatever is below it on its zones"""
+        return self.blend == "normal" and self.alpha == 1.0
+
+    def inputs(self, inputs):
+        """The composed effect's inputs, with this layer's own colours"""
+        return {**inputs, "colors": self.colors} if self.colors else inputs
+
+
+class Compositor:
+    """The layer stack, driven by the app like a registered effect (see legion.effects.Effect)"""
+    name = LAYERS
+    policy = SKIP
+    # Layers may be random or read the battery; the composition is never precomputed
+    cacheable = False
+
+    def __init__(self, layers=()):
+        self.layers = []
+        self.cache = {}
+        self.set_layers(layers)
+
+    def set_layers(self, layers):
+        self.layers = [layer if isinstance(layer, Layer) else Layer.from_dict(layer) for layer in layers]
+        self.cache = {}
+
+    @property
+    def animated(self):
+        return [layer for layer in self.layers if layer.spec]
+
+    @property
+    def depends(self):
+        names = {"colors", "speed"}
+        for layer in self.animated: names |= layer.spec.depends
+        return frozenset(names)
+
+    def substeps(self, speed, min_tick_ms=0):
+        return 1
+
+    def durations(self, speed):
+        """A single tick: the shortest frame duration of any animated layer"""
+        ticks = []
+        for layer in self.animated:
+            layer_speed = layer.speed or speed
+            spec = layer.spec
+            ticks.extend(spec.tick_durations(layer_speed, spec.substeps(layer_speed)))
+        return (min(ticks),) if ticks else (effects.idle_ms(speed),)
+
+    def tick_durations(self, speed, substeps=1):
+        return self.durations(speed)
+
+    def cached(self, owner, key, build):
+        """One cached value per owner (a static layer or the whole stack), rebuilt when ``key`` changes"""
+        entry = self.cache.get(owner)
+        if entry is None or entry[0] != key:
+            entry = self.cache[owner] = (key, build())
+        return entry[1]
+
+    def zone_colors(self, layer, t, inputs):
+        """(r, g, b) per zone of one layer, cached for static layers"""
+        inputs = layer.inputs(inputs)
+        if layer.spec is None:
+            colors = tuple(inputs["colors"])
+            return self.cached(id(layer), colors, lambda: [unpack_rgb(decode_color(c)) for c in colors])
+        speed = layer.speed or inputs["speed"]
+        zones = layer.spec.evaluate(t, layer.spec.durations(speed), inputs)
+        return [unpack_rgb(decode_color(c)) for c in zones]
+
+    def evaluate(self, t, durations, inputs):
+        """Zone colours (hex) of the composed layers ``t`` seconds in"""
+        if not self.animated:
+            return self.cached("stack", tuple(inputs["colors"]), lambda: self.compose(t, inputs))
+        return self.compose(t, inputs)
+
+    def compose(self, t, inputs):
+        out = [BLACK] * ZONES
+        for layer in self.layers:
+            if not layer.zones or layer.alpha == 0: continue
+            colors = self.zone_colors(layer, t, inputs)
+            blend, alpha = BLENDS[layer.blend], layer.alpha
+            for z in layer.zones:
+                below, top = out[z], colors[z]
+                out[z] = tuple(round(b + (blend(b, s) - b) * alpha) for b, s in zip(below, top))
+        return ["%02x%02x%02x" % rgb for rgb in out]
+
+    # --- Per-zone assignment, as the GUI edits it ---
+
+    def zone_effect(self, zone):
+        """Effect of the topmost opaque layer on a zone"""
+        for layer in reversed(self.layers):
+            if layer.opaque and zone in layer.zones: return layer.effect
+        return STATIC
+
+    def assign(self, zone, effect):
+        """Give a zone its own effect: move it to an opaque layer running ``effect``.
+
+        Opaque layers never overlap after this, so new ones go to the bottom
+        and blended overlays stay on top.
+        """
+        for layer in self.layers:
+            if layer.opaque: layer.zones = tuple(z for z in layer.zones if z != zone)
+        target = next((l for l in self.layers if l.opaque and l.effect == effect and not l.colors and l.speed is None), None)
+        if target is None:
+            target = Layer(effect, ())
+            self.layers.insert(0, target)
+        target.zones = tuple(sorted(target.zones + (zone,)))
+        self.layers = [l for l in self.layers if l.zones]
+        self.cache = {}
+
+    def to_list(self):
+        return [layer.to_dict() for layer in self.layers]
@@ -0,0 +1,211 @@
+"""
+LED controller used by the Legion Control GUI.
+
+Owns the transport backend (see legion.backends) and the send path. Transfers run on a FrameWriter thread
+so a slow device never blocks the caller. Frames identical to the last one that
+actually reached the keyboard are suppressed, with a periodic forced resync in
+case the firmware state was changed behind our back (suspend, other tools).
+The writer thread also resyncs while nothing is posted, which is how a
+keyboard replugged while idle gets reconnected and shown its frame again.
+
+ControllerGroup drives several controllers (see legion.devices) with one
+LedController, and therefore one writer thread, each.
+"""
+
+import time
+
+from legion.backends import Backend, open_backend
+from legion.devices import DEFAULT_PRODUCT, VENDOR, resolve_targets
+from legion.frames import EFFECT, encode_frame
+from legion.writer import FrameWriter
+
+
+class LedController:
+    VENDOR = VENDOR
+    PRODUCT = DEFAULT_PRODUCT # Other models are picked up from legion.devices.DEVICES
+    EFFECT = EFFECT
+    # Seconds after which an unchanged frame is sent again anyway (None = never)
+    RESYNC_INTERVAL = 5.0
+
+    def __init__(self, backend=None, resync_interval=RESYNC_INTERVAL, threaded=True, device=None):
+        # ``backend`` is a Backend instance or a spec string ("auto", "hidraw", "mock:latency=2").
+        # A missing device is not fatal: the backend keeps retrying in the background
+        self.device = device
+        if device is not None: self.PRODUCT = device.product
+        if not isinstance(backend, Backend):
+            backend = open_backend(backend, self.VENDOR, self.PRODUCT)
+        self.backend = backend
+
+        self.resync_interval = resync_interval
+        self.last_frame = None
+        self.last_sent_at = 0.0
+        self.frames_sent = 0
+        self.frames_suppressed = 0
+
+        # The writer thread is the only user of the backend once started
+        self.writer = FrameWriter(self._transmit, idle=self._resync) if threaded else None
+
+    def build_control_string(self, effect, colors=None, speed=1, brightness=1, wave_direction=None):
+        # Colors may be hex strings or packed 0xRRGGBB ints; decoded hex is memoized
+        return encode_frame(effect, colors, speed, brightness, wave_direction)
+
+    def is_duplicate(self, frame, now=None):
+        """True if ``frame`` matches what the keyboard already shows and no resync is due"""
+        if frame != self.last_frame:
+            return False
+        if self.resync_interval is None:
+            return True
+        if now is None: now = time.monotonic()
+        return now - self.last_sent_at < self.resync_interval
+
+    def send_control_string(self, data, force=False):
+        """Queue a frame for the keyboard and return immediately.
+
+        Without a writer thread the frame is sent inline and the return value
+        tells whether a transfer was made.
+        """
+        frame = bytes(data)
+        if self.writer:
+            self.writer.post(frame, force)
+            return True
+        return self._transmit(frame, force)
+
+    def _transmit(self, frame, force=False):
+        """Send a frame, skipping it if identical to the last transmitted one"""
+        now = time.monotonic()
+        if not force and self.is_duplicate(frame, now):
+            self.frames_suppressed += 1
+            return False
+
+        # Inline sends make a single attempt; the writer thread retries with backoff
+        if not self.backend.write(frame, None if self.writer else 1): return False
+
+        # Only remember frames that actually went out
+        self.last_frame = frame
+        self.last_sent_at = now
+        self.frames_sent += 1
+        return True
+
+    def _resync(self):
+        """Writer thread, between frames: send the shown frame again once a resync is due.
+
+        On a keyboard that was replugged the first attempt fails on the stale
+        handle and the second one reconnects. Returns seconds until the next check.
+        """
+        if self.resync_interval is None: return None
+        now = time.monotonic()
+        if now - self.last_sent_at < self.resync_interval:
+            return self.last_sent_at + self.resync_interval - now
+        frame = self.backend.last_frame
+        if frame is not None and self.backend.write(frame, 2):
+            self.last_frame = frame
+            self.last_sent_at = time.monotonic()
+            self.frames_sent += 1
+        return self.resync_interval
+
+    def invalidate(self):
+        """Forget the last frame so the next send always reaches the device"""
+        self.last_frame = None
+
+    def flush(self, timeout=None):
+        """Wait until every posted frame has been handled"""
+        if self.writer: return self.writer.flush(timeout)
+        return True
+
+    @property
+    def connected(self):
+        return self.backend.connected
+
+    def close(self, timeout=1.0):
+        # Give a healthy device the chance to receive the last frame, then
+        # abort any reconnect backoff so the writer thread can exit
+        self.flush(timeout)
+        self.backend.close()
+        if self.writer: self.writer.close(timeout)
+
+    def stats(self):
+        data = {
+            "frames_sent": self.frames_sent,
+            "frames_suppressed": self.frames_suppressed,
+        }
+        data.update(self.backend.stats())
+        if self.writer: data.update(self.writer.stats())
+        return data
+
+
+class ControllerGroup:
+    """Fans frames out to several controllers, each with its own writer thread.
+
+    Exposes the LedController send interface so the GUI does not care how many
+    keyboards it drives. A slow or unplugged controller only backs up its own
+    writer; the others keep receiving frames at their own pace.
+    """
+
+    def __init__(self, controllers):
+        self.controllers = list(controllers)
+
+    @classmethod
+    def open(cls, backend=None, selector=None, resync_interval=LedController.RESYNC_INTERVAL, threaded=True,
+             fallback=False):
+        """Open one LedController per controller matched by ``selector`` (see legion.devices.resolve_targets)"""
+        return cls(
+            LedController(spec, resync_interval, threaded, device)
+            for device, spec in resolve_targets(backend, selector, fallback)
+        )
+
+    @property
+    def primary(self):
+        return self.controllers[0]
+
+    @property
+    def writers(self):
+        return [c.writer for c in self.controllers if c.writer]
+
+    @property
+    def resync_interval(self):
+        return self.primary.resync_interval
+
+    @resync_interval.setter
+    def resync_interval(self, value):
+        for c in self.controllers: c.resync_interval = value
+
+    def build_control_string(self, effect, colors=None, speed=1, brightness=1, wave_direction=None):
+        return encode_frame(effect, colors, speed, brightness, wave_direction)
+
+    def send_control_string(self, data, force=False):
+        frame = bytes(data)
+        sent = False
+        for c in self.controllers:
+            sent = c.send_control_string(frame, force) or sent
+        return sent
+
+    def invalidate(self):
+        for c in self.controllers: c.invalidate()
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = True
+        for c in self.controllers:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done = c.flush(remaining) and done
+        return done
+
+    @property
+    def connected(self):
+        return any(c.connected for c in self.controllers)
+
+    def close(self, timeout=1.0):
+        # Flush everyone first so one dead keyboard does not cost the others their last frame
+        self.flush(timeout)
+        for c in self.controllers: c.backend.close()
+        for c in self.controllers:
+            if c.writer: c.writer.close(timeout)
+
+    def stats(self):
+        per_device = [c.stats() for c in self.controllers]
+        return {
+            "devices": len(per_device),
+            "frames_sent": sum(d["frames_sent"] for d in per_device),
+            "frames_suppressed": sum(d["frames_suppressed"] for d in per_device),
+            "per_device": per_device,
+        }
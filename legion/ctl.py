@@ -0,0 +1,90 @@
+"""
+Command line client of the control socket: ./legionctl.py (or python3 -m legion.ctl).
+
+    legionctl.py effect Fire --speed 3
+    legionctl.py colors ff0000 00ff00 0000ff ffffff
+    legionctl.py colors --zone 2 ff8800
+    legionctl.py profile Gaming
+    legionctl.py state
+    legionctl.py watch --count 10
+    legionctl.py send '[{"cmd": "set-effect", "effect": "static"}, {"cmd": "set-colors", "colors": ["ff0000"]}]'
+
+Each invocation is one request, so the commands given to ``send`` are
+applied together as one frame. Talks to whichever of the GUI or legiond.py
+is running.
+"""
+
+import argparse
+import json
+import sys
+
+from legion import ipc
+
+
+def build_commands(args):
+    if args.command == "show": return [{"cmd": "show"}]
+    if args.command == "state": return [{"cmd": "query-state"}]
+    if args.command == "watch": return [{"cmd": "subscribe-frames"}]
+    if args.command == "profile": return [{"cmd": "load-profile", "name": args.name}]
+    if args.command == "colors":
+        if args.zone is not None:
+            if len(args.colors) != 1: raise ValueError("--zone takes a single colour")
+            return [{"cmd": "set-colors", "zone": args.zone, "color": args.colors[0]}]
+        return [{"cmd": "set-colors", "colors": args.colors}]
+    if args.command == "effect":
+        command = {"cmd": "set-effect", "effect": args.effect}
+        for key in ("speed", "brightness", "direction", "level"):
+            if getattr(args, key) is not None: command[key] = getattr(args, key)
+        return [command]
+    commands = json.loads(args.commands)
+    return commands if isinstance(commands, list) else [commands]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Control the running Legion lighting (GUI or legiond.py)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show", help="Bring up the GUI window")
+    sub.add_parser("state", help="Print the current settings and engine counters")
+    watch = sub.add_parser("watch", help="Print every frame sent to the keyboard")
+    watch.add_argument("--count", type=int, help="Stop after this many frames")
+    profile = sub.add_parser("profile", help="Load a saved profile")
+    profile.add_argument("name")
+    colors = sub.add_parser("colors", help="Set zone colours (hex); fewer than four repeat the last")
+    colors.add_argument("colors", nargs="+")
+    colors.add_argument("--zone", type=int, choices=range(4), help="Set only this zone (0-3)")
+    effect = sub.add_parser("effect", help="Set the effect and its options")
+    effect.add_argument("effect")
+    effect.add_argument("--speed", type=int, choices=range(1, 5))
+    effect.add_argument("--brightness", choices=("Low", "High"))
+    effect.add_argument("--direction", choices=("LTR", "RTL"))
+    effect.add_argument("--level", type=int, help="Software brightness level 0-100")
+    send = sub.add_parser("send", help="Send a JSON list of commands as one atomic request")
+    send.add_argument("commands")
+    args = parser.parse_args(argv)
+
+    try:
+        commands = build_commands(args)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        with ipc.Client() as client:
+            results = client.request(*commands)
+            if args.command == "watch":
+                for n, event in enumerate(client.events(), 1):
+                    print(f"{event['t']:.3f} {event['frame']}", flush=True)
+                    if args.count and n >= args.count: break
+            elif args.command == "state" or any(r is not None for r in results):
+                print(json.dumps(results[0] if len(results) == 1 else results, indent=2))
+    except OSError:
+        print("No Legion lighting instance is running (start Legion_KBLight.py or legiond.py)", file=sys.stderr)
+        return 1
+    except ipc.ProtocolError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Headless lighting daemon: ./legiond.py (or python3 -m legion.daemon).
+
+Keeps software effects and the Battery gauge running without the GUI. It
+loads config.json, drives the keyboards through legion.engine and imports
+no Tk, PIL or tray code, so it stays resident in a fraction of the GUI's
+memory. The GUI started with --client becomes an editor for it: it opens no
+controller and writes its settings to config.json, which the daemon polls
+and re-applies. The daemon also serves the control socket (legion.ipc), so
+legionctl.py and other clients can change the lighting directly; such
+changes last until config.json changes next.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+
+from legion import ipc
+from legion.controller import ControllerGroup, LedController
+from legion.engine import LightingEngine, normalize_profile
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.json")
+# Global settings of config.json the engine uses (the rest belongs to the GUI)
+PREF_KEYS = ("pref_batt_low", "pref_batt_green", "pref_batt_full", "pref_fade_ms", "pref_offload",
+             "usb_resync_interval")
+# How often config.json is checked for changes
+POLL_MS = 1000
+
+
+def load_config(path=CONFIG_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def active_profile(config):
+    """The current profile of a config, falling back to Default"""
+    profiles = config.get("profiles") or {}
+    return normalize_profile(profiles.get(config.get("current_profile", "Default")) or profiles.get("Default") or {})
+
+
+def preferences(config):
+    return {k: config[k] for k in PREF_KEYS if k in config}
+
+
+class ConfigWatcher:
+    """Tick source re-applying config.json whenever the file changes"""
+
+    def __init__(self, engine, path=CONFIG_PATH):
+        self.engine = engine
+        self.path = path
+        self.mtime = self.stat()
+
+    def stat(self):
+        try: return os.stat(self.path).st_mtime_ns
+        except OSError: return None
+
+    def __call__(self, now):
+        mtime = self.stat()
+        if mtime != self.mtime:
+            self.mtime = mtime
+            config = load_config(self.path)
+            if config: self.engine.configure(active_profile(config), preferences(config))
+        return POLL_MS
+
+
+class EngineTarget:
+    """Control socket commands for the engine: each batch runs on the engine thread and shows one frame"""
+
+    def __init__(self, engine, path=CONFIG_PATH):
+        self.engine = engine
+        self.path = path
+
+    def __call__(self, commands):
+        return ipc.call_in(self.engine.call_soon, lambda: self.apply(commands))
+
+    def apply(self, commands):
+        engine = self.engine
+        config = load_config(self.path) if any(c["cmd"] == "load-profile" for c in commands) else {}
+        profiles = config.get("profiles") or {}
+        # Check everything before changing anything
+        for c in commands:
+            if c["cmd"] == "load-profile" and c["name"] not in profiles:
+                raise ipc.ProtocolError(f"Unknown profile '{c['name']}'")
+
+        profile = dict(engine.profile)
+        for c in commands:
+            # A loaded profile replaces the settings, like in the GUI
+            if c["cmd"] == "load-profile": profile = normalize_profile(profiles[c["name"]])
+            else: ipc.merge(profile, c)
+        if profile != engine.profile: engine.configure(profile)
+
+        results = []
+        for c in commands:
+            if c["cmd"] == "query-state": results.append(self.state(config))
+            elif c["cmd"] == "show": results.append({"window": False})
+            else: results.append(None)
+        return results
+
+    def state(self, config):
+        engine = self.engine
+        plan = engine.offload_plan()
+        config = config or load_config(self.path)
+        return {
+            "server": "daemon",
+            "profile": dict(engine.profile),
+            "current_profile": config.get("current_profile"),
+            "profiles": sorted(config.get("profiles") or {}),
+            "active_colors": list(engine.active_colors),
+            "offload": plan.effect if plan else None,
+            "stats": engine.stats(),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Legion lighting daemon (no GUI)")
+    parser.add_argument("--config", default=CONFIG_PATH, help="Settings file written by the GUI (default: %(default)s)")
+    parser.add_argument("--backend", help="Keyboard transport: auto (default), pyusb, hidraw, sysfs or mock[:...]")
+    parser.add_argument("--device", help="Keyboards to drive: all, an index or a serial (default: the GUI's choice)")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    engine = LightingEngine()
+    # The socket is the single-instance lock: whoever holds it owns the keyboard, so take it
+    # before touching the device (requests wait in call_soon until the engine runs)
+    server = ipc.ControlServer(EngineTarget(engine, args.config))
+    if not server.start():
+        print("Control socket in use: the app or another daemon already drives the keyboard", file=sys.stderr)
+        return 1
+    try:
+        # Only the app's saved choice falls back to all keyboards when it is not attached
+        controller = ControllerGroup.open(args.backend, args.device or config.get("keyboard_device", "all"),
+                                          config.get("usb_resync_interval", LedController.RESYNC_INTERVAL),
+                                          fallback=not args.device)
+    except Exception as e:
+        server.close()
+        print(f"Keyboard controller unavailable: {e}", file=sys.stderr)
+        return 1
+
+    engine.attach(controller)
+    engine.configure(active_profile(config), preferences(config), force=True)
+    engine.ticker.add("config", ConfigWatcher(engine, args.config), POLL_MS)
+    engine.listeners.append(server.publish)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *a: engine.stop())
+    try:
+        engine.run()
+    finally:
+        server.close()
+        # Let the writer thread finish the last frame
+        controller.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Registry of ITE keyboard lighting controllers and device discovery.
+
+Legion generations ship the same ITE 8295 style controller under different
+product IDs. The registry maps each product ID to the protocol variant that
+drives it; discovery walks sysfs (no libusb, no device opens) and returns one
+DeviceInfo per attached controller. Each DeviceInfo produces a backend spec
+that pins the backend to that exact device, so every controller can get its
+own LedController and writer thread.
+
+Devices are addressed by index (order of USB port path), serial number or
+port path, e.g. "0", "1,2", "SN1234", "1-3" or "all".
+"""
+
+import glob
+import os
+
+from legion.frames import FRAME_SIZE, ZONES
+
+VENDOR = 0x048D
+USB_DEVICES_DIR = "/sys/bus/usb/devices"
+
+
+class Protocol:
+    """How a controller family expects its lighting frames"""
+
+    def __init__(self, name, zones=ZONES, report_id=0xCC, frame_size=FRAME_SIZE):
+        self.name = name
+        self.zones = zones
+        self.report_id = report_id
+        self.frame_size = frame_size
+
+
+ITE_4ZONE = Protocol("ite-4zone")
+
+# Product ID -> protocol variant
+DEVICES = {
+    0xC955: ITE_4ZONE,  # Legion 2020
+    0xC963: ITE_4ZONE,
+    0xC965: ITE_4ZONE,  # Legion 5 Pro 2021 (l5p-kbl)
+    0xC973: ITE_4ZONE,
+    0xC975: ITE_4ZONE,  # Legion 2022
+    0xC983: ITE_4ZONE,
+    0xC984: ITE_4ZONE,
+    0xC985: ITE_4ZONE,  # Legion 2023
+    0xC993: ITE_4ZONE,  # Legion 2024
+    0xC994: ITE_4ZONE,
+    0xC995: ITE_4ZONE,
+}
+DEFAULT_PRODUCT = 0xC965
+
+
+class DeviceInfo:
+    def __init__(self, index, product, port, serial=None):
+        self.index = index
+        self.product = product
+        self.port = port
+        self.serial = serial
+        self.protocol = DEVICES.get(product, ITE_4ZONE)
+
+    @property
+    def label(self):
+        return f"{self.index}: {VENDOR:04x}:{self.product:04x} {self.serial or self.port}"
+
+    def matches(self, token):
+        token = token.strip()
+        if token.isdigit() and int(token) == self.index: return True
+        return token in (self.serial, self.port)
+
+    def backend_spec(self, name):
+        """Backend spec pinned to this device (only USB transports can be pinned)"""
+        if name in ("pyusb", "hidraw"):
+            return f"{name}:port={self.port}"
+        return name
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "product": f"{self.product:04x}",
+            "port": self.port,
+            "serial": self.serial,
+            "protocol": self.protocol.name,
+        }
+
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def discover_devices():
+    """Every attached controller from the registry, ordered by port path"""
+    found = []
+    for sysfs in glob.glob(os.path.join(USB_DEVICES_DIR, "*")):
+        port = os.path.basename(sysfs)
+        # Interfaces ("1-3:1.0") and root hubs ("usb1") are not devices
+        if ":" in port or port.startswith("usb"): continue
+        try:
+            vendor = int(_read(os.path.join(sysfs, "idVendor")) or "0", 16)
+            product = int(_read(os.path.join(sysfs, "idProduct")) or "0", 16)
+        except ValueError:
+            continue
+        if vendor != VENDOR or product not in DEVICES: continue
+        found.append((port, product, _read(os.path.join(sysfs, "serial"))))
+
+    found.sort(key=lambda d: [int(p) for p in d[0].replace("-", ".").split(".") if p.isdigit()])
+    return [DeviceInfo(i, product, port, serial) for i, (port, product, serial) in enumerate(found)]
+
+
+def select_devices(devices, selector=None):
+    """Filter discovered devices by a selector ("all", "0", "1,SN1234", ...)"""
+    if not selector or selector == "all": return list(devices)
+    tokens = [t for t in selector.split(",") if t.strip()]
+    selected = [d for d in devices if any(d.matches(t) for t in tokens)]
+    if not selected:
+        raise ValueError(f"No keyboard controller matches '{selector}'")
+    return selected
+
+
+def resolve_targets(spec=None, selector=None, fallback=False):
+    """Return [(DeviceInfo or None, backend spec)] for every controller to drive.
+
+    Only the USB transports can address individual controllers. Other
+    backends, or a machine where no registered controller is attached yet,
+    yield a single target with the spec unchanged (the backend will keep
+    looking for the default device in the background). A selector that
+    matches none of the attached controllers raises ValueError, unless
+    ``fallback`` is set (a saved keyboard that was unplugged or replaced):
+    then all of them are driven, with a warning.
+    """
+    from legion.backends import BACKEND_ENV, DEFAULT_BACKEND, parse_backend_spec
+
+    spec = spec or os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND
+    name, options = parse_backend_spec(spec)
+    if name not in ("auto", "pyusb", "hidraw") or options:
+        return [(None, spec)]
+
+    devices = discover_devices()
+    try: devices = select_devices(devices, selector)
+    except ValueError as e:
+        if not fallback: raise
+        print(f"{e}; driving all keyboards instead")
+    if not devices: return [(None, spec)]
+    # auto prefers pyusb whenever a registered USB controller is attached
+    name = "pyusb" if name == "auto" else name
+    return [(device, device.backend_spec(name)) for device in devices]
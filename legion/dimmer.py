@@ -0,0 +1,92 @@
+"""
+Software brightness: 0-100 levels on top of the hardware's Low/High.
+
+A level scales the colour bytes of every outgoing frame. Scaled values are
+rarely whole numbers, and at low levels rounding them is coarse: a channel
+at 3 dimmed to 50% becomes 1 or 2, a 33% error. Temporal dithering shows the
+two neighbouring whole values in turn instead, in the ratio of the
+fraction, over a cycle of PHASES frames.
+
+Everything is table driven. Per level there is one 256-byte translation
+table per phase (value -> value shown in that phase), built once, so
+dimming a frame is a single bytes.translate of its colour section. Only
+static frames are dithered: resending a breath frame restarts the
+firmware's animation, so breath colours are rounded instead. A static frame
+that stays unchanged for HOLD_MS settles on the rounded colours, so an idle
+dimmed keyboard does not cost a USB transfer every tick forever.
+
+Only colour bytes are scaled. The firmware's wave and hue effects carry no
+colours, so the level has no effect on them.
+"""
+
+from functools import lru_cache
+
+from legion.frames import COLOR_OFFSET, EFFECT, ZONES
+
+COLOR_END = COLOR_OFFSET + ZONES * 3
+MAX_LEVEL = 100
+PHASES = 4
+
+
+@lru_cache(maxsize=None)
+def duty(k, phases=PHASES):
+    """Phases that show the upper value for a fraction of k/phases, spread evenly over the cycle"""
+    return tuple((p + 1) * k // phases - p * k // phases for p in range(phases))
+
+
+@lru_cache(maxsize=16)
+def dither_tables(level, phases=PHASES):
+    """One translation table per phase for a level"""
+    rows = [bytearray(256) for _ in range(phases)]
+    for v in range(256):
+        exact = v * level / MAX_LEVEL
+        base = int(exact)
+        for p, bump in enumerate(duty(round((exact - base) * phases), phases)):
+            rows[p][v] = min(255, base + bump)
+    return tuple(map(bytes, rows))
+
+
+@lru_cache(maxsize=16)
+def rounded_table(level):
+    """Translation table of a level without dithering"""
+    return bytes(round(v * level / MAX_LEVEL) for v in range(256))
+
+
+class Dimmer:
+    # Dither at most this often (~60 fps) ...
+    DITHER_TICK_MS = 16
+    # ... and not at all if the device is too slow to finish a cycle in this time (it would flicker)
+    MAX_CYCLE_MS = 200
+    # Stop dithering a frame that has been held this long
+    HOLD_MS = 10000
+
+    def __init__(self, level=MAX_LEVEL, phases=PHASES):
+        self.phases = phases
+        self.phase = 0
+        self.set_level(level)
+
+    def set_level(self, level):
+        self.level = max(0, min(MAX_LEVEL, int(level)))
+        self.tables = dither_tables(self.level, self.phases)
+        self.rounded = rounded_table(self.level)
+
+    def interval_ms(self, min_interval_ms):
+        """Dither frame interval at the device's minimum interval, None if it cannot dither"""
+        interval = max(min_interval_ms, self.DITHER_TICK_MS)
+        return interval if interval * self.phases <= self.MAX_CYCLE_MS else None
+
+    def dim(self, frame, dither=True):
+        """The frame at the current level; dithered static frames advance the phase"""
+        if self.level == MAX_LEVEL: return frame
+        if dither and frame[2] == EFFECT["static"]:
+            table = self.tables[self.phase]
+            self.phase = (self.phase + 1) % self.phases
+        else:
+            table = self.rounded
+        return frame[:COLOR_OFFSET] + frame[COLOR_OFFSET:COLOR_END].translate(table) + frame[COLOR_END:]
+
+    def dithers(self, frame):
+        """True if the frame looks different from phase to phase (so it needs refreshing while held)"""
+        if self.level == MAX_LEVEL or frame[2] != EFFECT["static"]: return False
+        colors = frame[COLOR_OFFSET:COLOR_END]
+        return any(colors.translate(t) != colors.translate(self.tables[0]) for t in self.tables[1:])
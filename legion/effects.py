@@ -0,0 +1,199 @@
+"""
+Software lighting effects as functions of elapsed time, and their registry.
+
+Each effect has a cycle of step durations (ms, per speed level) and is
+evaluated for an elapsed time ``t`` in seconds since its timeline started.
+The step shown at ``t`` follows from the durations alone, so an effect looks
+the same no matter how late, or how often, the scheduler asks for it.
+
+Effects register themselves with what the engine needs to know to drive
+them: cycle length, whether the output is deterministic, step timing per
+speed, late-frame policy and which inputs they read. Evaluators receive
+exactly those inputs in a dict:
+
+* ``colors``: the four zone colours (hex strings)
+* ``direction``: "LTR" or "RTL"
+* ``speed``: the speed level (1-4)
+* ``battery``: (low warning, lit zones, base rgb, pulsing), see the app's battery_bar
+"""
+
+import math
+import random
+
+from legion import canvas
+from legion.frames import EFFECT, decode_color, encode_frame, unpack_rgb
+from legion.timeline import CATCH_UP, SKIP, step_at
+
+BLACK = "000000"
+# Effects run by the keyboard firmware itself
+HARDWARE_EFFECTS = tuple(EFFECT)
+# Inputs that change without a settings change and must be read every tick
+VOLATILE = frozenset({"battery"})
+
+# Step duration (ms) per speed level, and for an unknown speed
+DEFAULT_STEP_MS = ({1: 800, 2: 400, 3: 200, 4: 100}, 400)
+# Smooth effects are rendered this often (~40 fps), in up to MAX_SUBSTEPS frames per step
+SMOOTH_TICK_MS = 25
+MAX_SUBSTEPS = 8
+
+
+class Effect:
+    """A registered software effect.
+
+    ``steps`` is the cycle length in steps (None if the output never
+    repeats), ``step_ms`` a ({speed: ms}, fallback) pair or ``cycle_ms`` a
+    fixed tuple of step durations, ``depends`` the inputs it reads. Smooth
+    effects move continuously (see legion.canvas) and are rendered in
+    several frames per step.
+    """
+
+    def __init__(self, name, evaluate, steps=None, deterministic=True, step_ms=DEFAULT_STEP_MS,
+                 cycle_ms=None, depends=(), policy=SKIP, smooth=False):
+        self.name = name
+        self.evaluate = evaluate
+        self.steps = steps
+        self.deterministic = deterministic
+        self.step_ms = step_ms
+        self.cycle_ms = cycle_ms
+        self.depends = frozenset(depends)
+        self.policy = policy
+        self.smooth = smooth
+
+    @property
+    def cacheable(self):
+        """Output is a pure function of the settings and repeats: one cycle can be precomputed"""
+        return self.deterministic and self.steps is not None and not (self.depends & VOLATILE)
+
+    def durations(self, speed):
+        """The cycle of step durations (ms) at a speed level"""
+        if self.cycle_ms: return self.cycle_ms
+        table, fallback = self.step_ms
+        return (table.get(speed, fallback),)
+
+    def substeps(self, speed, min_tick_ms=0):
+        """Frames rendered per step: as many as fit at ~40 fps (or what the device sustains)"""
+        if not self.smooth: return 1
+        tick = max(SMOOTH_TICK_MS, min_tick_ms)
+        return max(1, min(MAX_SUBSTEPS, int(min(self.durations(speed)) // tick)))
+
+    def tick_durations(self, speed, substeps=1):
+        """Timeline durations (ms) of the rendered frames"""
+        return tuple(d / substeps for d in self.durations(speed) for _ in range(substeps))
+
+
+REGISTRY = {}
+
+
+def register(name, **options):
+    """Decorator adding an evaluator ``fn(t, durations, inputs)`` to the registry"""
+    def wrap(fn):
+        REGISTRY[name] = Effect(name, fn, **options)
+        return fn
+    return wrap
+
+
+def idle_ms(speed):
+    """Poll interval of the animation loop while a hardware effect runs"""
+    table, fallback = DEFAULT_STEP_MS
+    return table.get(speed, fallback)
+
+
+@register("Police", steps=2, step_ms=({1: 600, 2: 350, 3: 180, 4: 90}, 350))
+def police(t, durations, inputs):
+    # Alternate flashing Red and Blue
+    if step_at(t, durations) % 2 == 0:
+        return ["ff0000", "ff0000", "0000ff", "0000ff"]
+    return ["0000ff", "0000ff", "ff0000", "ff0000"]
+
+
+def _hex(rgbs):
+    return ["%02x%02x%02x" % rgb for rgb in rgbs]
+
+
+def _position(t, durations):
+    """Continuous step position ``t`` seconds in (single-duration effects)"""
+    return round(t * 1000 / durations[0], 6)
+
+
+@register("Scanner", steps=6, step_ms=({1: 400, 2: 250, 3: 120, 4: 60}, 150), depends=("colors",),
+          policy=CATCH_UP, smooth=True)
+def scanner(t, durations, inputs):
+    # Glide a one zone wide bar of the zone 1 colour back and forth across the strip
+    strip = canvas.scanner_strip(_position(t, durations), unpack_rgb(decode_color(inputs["colors"][0])))
+    return _hex(canvas.downsample(strip))
+
+
+# Lit 180 ms, dark 120, lit 1200, dark 120, as the original loop timed it (independent of speed)
+@register("Heartbeat", steps=4, cycle_ms=(180, 120, 1200, 120), depends=("colors",), policy=CATCH_UP)
+def heartbeat(t, durations, inputs):
+    # Light on steps 0 and 2, dark on the short gaps after them
+    if step_at(t, durations) % 4 in (0, 2): return list(inputs["colors"])
+    return [BLACK] * 4
+
+
+@register("Fire", deterministic=False, step_ms=({1: 250, 2: 150, 3: 80, 4: 40}, 100))
+def fire(t, durations, inputs):
+    # Rapid randomized intensities of orange/red
+    return [f"{random.randint(180, 255):02x}{random.randint(0, 80):02x}00" for _ in range(4)]
+
+
+@register("Battery", depends=("battery",))
+def battery(t, durations, inputs):
+    # Zone representation of battery percentage
+    warning, count, base_rgb, pulsing = inputs["battery"]
+    if warning:
+        # Discharging below the low threshold: blink all zones red
+        return ["ff0000" if blink_on(t, durations) else BLACK] * 4
+    level = pulse(t, durations) if pulsing else 1.0
+    active = "%02x%02x%02x" % tuple(int(c * level) for c in base_rgb)
+    return [active] * count + [BLACK] * (4 - count)
+
+
+@register("Soft Wave", steps=4, depends=("colors", "direction"), smooth=True)
+def soft_wave(t, durations, inputs):
+    # Slide the four zone colours along the strip; zones blend while a boundary crosses them
+    rgbs = [unpack_rgb(decode_color(c)) for c in inputs["colors"]]
+    strip = canvas.wave_strip(_position(t, durations), rgbs, inputs.get("direction") == "RTL")
+    return _hex(canvas.downsample(strip))
+
+
+def blink_on(t, durations):
+    """True on even steps; the battery warning blinks at the effect's step rate"""
+    return step_at(t, durations) % 2 == 0
+
+
+def pulse(t, durations):
+    """Subtle 0.7..1.0 brightness pulse, one sine period every ~16 steps"""
+    return 0.7 + 0.3 * abs(math.sin(t * 1000 / durations[0] * 0.2))
+
+
+class FrameTable:
+    """One cycle of a cacheable effect, encoded once and then replayed by index.
+
+    Holds, per frame, the zone colours (for the preview), the ready-to-send
+    frame and its duration; smooth effects have ``substeps`` frames per step.
+    Build a new table whenever the effect's inputs, speed or brightness change.
+    """
+
+    def __init__(self, effect, inputs, speed=1, brightness=1, substeps=1):
+        cycle = effect.durations(speed)
+        ticks = effect.tick_durations(speed, substeps)
+        self.effect = effect
+        self.substeps = substeps
+        self.durations = tuple(ticks[i % len(ticks)] for i in range(effect.steps * substeps))
+        self.colors = []
+        self.frames = []
+        start = 0
+        for duration in self.durations:
+            zones = effect.evaluate(start / 1000, cycle, inputs)
+            self.colors.append(zones)
+            self.frames.append(encode_frame("static", zones, speed, brightness))
+            start += duration
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, step):
+        """(zone colours, frame) of a timeline step"""
+        i = step % len(self.frames)
+        return self.colors[i], self.frames[i]
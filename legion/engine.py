@@ -0,0 +1,391 @@
+"""
+The lighting engine without a GUI.
+
+LightingEngine takes one profile's settings, as the app keeps them in
+config.json, and turns them into frames: frame tables and batched streams on
+a Timeline, the layer compositor, firmware offload, crossfades and the
+software brightness level, all driven by one TickScheduler and the Battery
+gauge fed from sysfs. It imports neither Tk nor PIL. The GUI and the
+resident daemon (legion.daemon) both drive one, so there is a single
+lighting pipeline.
+
+The engine is single threaded. The daemon runs it with run(); the GUI drives
+it from its after() chain instead (run_calls, ticker.run, process) and points
+``wake`` at that chain. Other threads hand work over with call_soon(), which
+also wakes the owner (legion.ipc.call_in waits for the result).
+"""
+
+import copy
+import threading
+import time
+from collections import deque
+
+from legion import batch, effects, offload
+from legion.battery import DEFAULT_THRESHOLDS, battery_bar, read_battery
+from legion.compositor import DEFAULT_LAYERS, LAYERS, Compositor
+from legion.dimmer import MAX_LEVEL, Dimmer
+from legion.frames import decode_color
+from legion.governor import FrameGovernor, load_capability
+from legion.scheduler import DITHER_FRAME, EFFECT_FRAME, FADE_FRAME, TickScheduler
+from legion.timeline import Timeline
+from legion.transition import Crossfade
+
+# A profile as the GUI saves it (see LegionLightApp._get_current_settings_dict)
+DEFAULT_PROFILE = {
+    "effect": "static",
+    "brightness": "Low",
+    "speed": 2,
+    "wave_direction": "LTR",
+    "colors": ["39c5bb"] * 4,
+    "level": MAX_LEVEL,
+    "layers": list(DEFAULT_LAYERS),
+}
+# The profile keys frames are built from ("level" only dims them on output)
+FRAME_KEYS = ("effect", "brightness", "speed", "wave_direction", "colors", "layers")
+
+
+def normalize_profile(profile):
+    """A saved profile with every key; missing ones (older config.json) fall back to DEFAULT_PROFILE"""
+    result = {k: profile.get(k, v) for k, v in DEFAULT_PROFILE.items()}
+    colors = [_profile_color(c) for c in list(result["colors"])[:4]]
+    result["colors"] = colors + DEFAULT_PROFILE["colors"][len(colors):]
+    result["layers"] = list(result["layers"])
+    return result
+
+
+def _profile_color(color):
+    """Saved colours as hex; older profiles may hold loosely formatted RGB (see decode_color)"""
+    try: return "%06x" % decode_color(str(color), lenient=True)
+    except ValueError: return color
+
+
+class LightingEngine:
+    def __init__(self, controller=None, clock=time.monotonic):
+        self.clock = clock
+        self.governor = FrameGovernor()
+        self.attach(controller)
+        self.ticker = TickScheduler(clock)
+        self.timeline = Timeline(clock)
+        self.compositor = Compositor(DEFAULT_LAYERS)
+        self.crossfade = Crossfade(clock=clock)
+        self.dimmer = Dimmer()
+        self.profile = dict(DEFAULT_PROFILE)
+        self.thresholds = DEFAULT_THRESHOLDS
+        self.offload_enabled = True
+        self.battery = read_battery()
+        # frame_settings() as of the last invalidation
+        self.settings = None
+
+        # Software effect state, as in the GUI
+        self.active_colors = list(self.profile["colors"])
+        self.pending_frame = None
+        self.table = None
+        self.table_enabled = True
+        self.stream = None
+        self.timeline_key = None
+        self.plan = None
+        self.planned = False
+        self.offloaded = None
+        # Frames on their way out: the running fade's, and the last one sent (for dithering):
+        # when it was last sent, and when it was first sent
+        self.fade_frame = None
+        self.held_frame = None
+        self.held_since = 0.0
+        self.held_from = 0.0
+
+        # Called with every frame sent (legion.ipc frame subscriptions)
+        self.listeners = []
+        self.calls = deque()
+        self.wakeup = threading.Event()
+        # Called (from any thread) when there is work before the next deadline
+        self.wake = self.wakeup.set
+        self.running = False
+        self.ticker.add("animation", self.animation_tick)
+        self.ticker.add("fade", self.fade_tick)
+        self.ticker.add("dither", self.dither_tick)
+        self.ticker.add("battery", self.battery_tick, 1000)
+
+    def attach(self, controller):
+        """Drive ``controller`` (a ControllerGroup, or None) from now on"""
+        self.controller = controller
+        self.governor.writers = list(controller.writers) if controller else []
+        self.governor.max_fps = None
+        if controller:
+            self.governor.update(*(load_capability(c.VENDOR, c.PRODUCT, backend=c.backend.name)
+                                   for c in controller.controllers))
+
+    # --- Settings ---
+
+    def configure(self, profile=None, prefs=None, force=False):
+        """Adopt (part of) a profile and/or the global preferences, then show the result"""
+        self.update(profile, prefs)
+        self.apply(force=force)
+
+    def update(self, profile=None, prefs=None):
+        """Adopt (part of) a profile and/or the global preferences without sending anything"""
+        if profile: self.profile.update(profile)
+        if prefs:
+            self.thresholds = tuple(prefs.get(k, d) for k, d in zip(("pref_batt_low", "pref_batt_green", "pref_batt_full"),
+                                                                    self.thresholds))
+            self.crossfade.duration_ms = prefs.get("pref_fade_ms", self.crossfade.duration_ms)
+            self.offload_enabled = prefs.get("pref_offload", self.offload_enabled)
+            if self.controller and "usb_resync_interval" in prefs:
+                self.controller.resync_interval = prefs["usb_resync_interval"]
+        level = self.dimmer.level
+        self.dimmer.set_level(self.profile.get("level", MAX_LEVEL))
+        if self.dimmer.level != level:
+            # A new level is a new frame on the keyboard: dither it for a full hold again
+            self.held_from = self.clock()
+            self.arm_dither()
+        # The level is applied to every frame on output; anything else rebuilds the precomputed ones
+        settings = self.frame_settings()
+        if settings == self.settings: return
+        self.settings = settings
+        try: self.compositor.set_layers(self.profile.get("layers") or DEFAULT_LAYERS)
+        except (TypeError, ValueError): self.compositor.set_layers(DEFAULT_LAYERS)
+        self.invalidate()
+
+    def frame_settings(self):
+        """Everything the frame tables, streams and the offload plan are built from"""
+        # A copy, so lists edited in place between updates still compare as changed
+        return copy.deepcopy([self.profile.get(k) for k in FRAME_KEYS]), self.thresholds, self.offload_enabled
+
+    def invalidate(self):
+        """Settings changed: drop precomputed frames, plan again and wake the animation"""
+        self.table = None
+        self.stream = None
+        self.planned = False
+        self.offloaded = None
+        self.ticker.wake("animation")
+        self.wake()
+
+    def spec(self):
+        """The registered software effect, the layer compositor, or None for a hardware effect"""
+        effect = self.profile["effect"]
+        if effect == LAYERS: return self.compositor
+        return effects.REGISTRY.get(effect)
+
+    def effect_inputs(self, spec, names=None):
+        """Read the inputs a software effect declares (optionally only some of them)"""
+        wanted = spec.depends if names is None else spec.depends & names
+        inputs = {}
+        if "colors" in wanted: inputs["colors"] = list(self.profile["colors"])
+        if "direction" in wanted: inputs["direction"] = self.profile["wave_direction"]
+        if "speed" in wanted: inputs["speed"] = self.profile["speed"]
+        if "battery" in wanted: inputs["battery"] = battery_bar(self.battery, self.thresholds)
+        return inputs
+
+    def offload_plan(self):
+        """The firmware effect standing in for the current software effect, if any"""
+        if not self.planned:
+            spec = self.spec()
+            self.plan = None
+            if spec and self.offload_enabled:
+                self.plan = offload.plan(spec, self.effect_inputs(spec), self.profile["speed"])
+            self.planned = True
+        return self.plan
+
+    def brightness_level(self):
+        """Hardware brightness; nothing is sent while OFF"""
+        brightness = self.profile["brightness"]
+        self.table_enabled = brightness != "OFF"
+        return 2 if brightness == "High" else 1
+
+    # --- Frames ---
+
+    def apply(self, animation=False, force=False, overlay=None):
+        """Send the frame of the current settings (software effects: their current colours)
+
+        animation: a frame of something running (an effect step, the GUI's blink), which
+        does not start a crossfade. overlay(colors) adjusts the zone colours first.
+        """
+        if not self.controller or self.profile["brightness"] == "OFF": return
+        effect = self.profile["effect"]
+        spec = self.spec()
+        plan = self.offload_plan() if spec else None
+        hw_effect = effect
+        if spec: hw_effect = plan.effect if plan else "static"
+        colors = plan.colors if plan else self.active_colors if spec else self.profile["colors"]
+        if overlay: colors = overlay(colors)
+        data = self.controller.build_control_string(
+            hw_effect, colors, plan.speed if plan else self.profile["speed"], self.brightness_level(),
+            (plan.direction if plan else self.profile["wave_direction"]) if hw_effect == "wave" else None
+        )
+        # Manual changes crossfade; animation frames only retarget a fade that is already running
+        self.send_frame(data, force=force, fade=not animation or self.crossfade.active)
+
+    def send_frame(self, data, force=False, fade=True):
+        """Send a control frame, crossfading into it from the shown frame when both are static colours"""
+        if fade and not force and self.crossfade.fade_to(data, self.governor.min_interval_ms()):
+            self.ticker.wake("fade")
+            self.wake()
+            return
+        self.crossfade.show(data)
+        self.output(data, force=force)
+
+    def output(self, data, force=False):
+        """Last stage of every frame: apply the software brightness level and send"""
+        now = self.clock()
+        changed = data != self.held_frame
+        if changed: self.held_from = now
+        self.held_frame = data
+        self.held_since = now
+        if changed: self.arm_dither()
+        frame = self.dimmer.dim(data, self.dithering(now))
+        self.controller.send_control_string(frame, force=force)
+        for listener in self.listeners:
+            listener(frame)
+
+    def dither_interval(self):
+        """Dither frame interval (ms) the device can afford, None if it is too slow to dither"""
+        return self.dimmer.interval_ms(self.governor.min_interval_ms())
+
+    def dithering(self, now):
+        """Whether the held frame is still dithered (it settles on rounded colours after HOLD_MS)"""
+        return self.dither_interval() is not None and (now - self.held_from) * 1000 < self.dimmer.HOLD_MS
+
+    def process(self, dirty):
+        """Turn the flags of one scheduler run into at most one frame"""
+        if not self.controller: return
+        if EFFECT_FRAME in dirty:
+            frame, self.pending_frame = self.pending_frame, None
+            if frame is None: self.apply(animation=True)
+            elif self.table_enabled: self.send_frame(frame, fade=self.crossfade.active)
+        if FADE_FRAME in dirty:
+            frame, self.fade_frame = self.fade_frame, None
+            self.output(frame)
+        elif DITHER_FRAME in dirty and EFFECT_FRAME not in dirty and self.held_frame:
+            self.output(self.held_frame)
+
+    # --- Tick sources ---
+
+    def animation_tick(self, now):
+        """Software effects, paced by a monotonic timeline"""
+        spec = self.spec()
+        speed = self.profile["speed"]
+        if spec is None:
+            # Hardware effect: the firmware runs it, sleep until the settings change
+            self.timeline_key = None
+            return None
+
+        plan = self.offload_plan()
+        if plan:
+            # The firmware runs it: send its frame once, then sleep until a setting changes
+            self.timeline_key = None
+            if self.offloaded != plan:
+                self.offloaded = plan
+                self.active_colors = plan.colors
+                self.pending_frame = None
+                self.ticker.mark(EFFECT_FRAME)
+            return None
+        self.offloaded = None
+
+        # Smooth effects render several frames per step, as many as the device sustains
+        substeps = spec.substeps(speed, self.governor.min_interval_ms())
+        source = None
+        if spec.cacheable:
+            table = self.table
+            if table is None or table.effect is not spec or table.substeps != substeps:
+                self.table = effects.FrameTable(spec, self.effect_inputs(spec), speed, self.brightness_level(), substeps)
+            source = self.table
+        elif batch.available() and spec.name in batch.EFFECTS:
+            source = self.stream_for(spec, speed, substeps)
+        ticks = self.table.durations if spec.cacheable else spec.tick_durations(speed, substeps)
+        # Stretch the steps if the controller cannot keep up with them
+        durations = tuple(self.governor.stretch(d) for d in ticks)
+
+        key = (spec.name, speed, substeps)
+        if self.timeline_key != key:
+            self.timeline_key = key
+            self.timeline.start(durations, spec.policy)
+        else:
+            self.timeline.retime(durations)
+
+        t = self.timeline.tick(now)
+        if source:
+            self.active_colors, self.pending_frame = source[self.timeline.current]
+        else:
+            # Evaluators take the step durations, not the rendered frames'
+            cycle = tuple(self.governor.stretch(d) for d in spec.durations(speed))
+            self.active_colors = spec.evaluate(t, cycle, self.effect_inputs(spec))
+            self.pending_frame = None
+        self.ticker.mark(EFFECT_FRAME)
+        # Sleep until the next step's deadline, so the work above does not add to the period
+        return self.timeline.delay_ms()
+
+    def stream_for(self, spec, speed, substeps=1):
+        """Batched frames of an effect; volatile inputs (battery) rebuild it when they change"""
+        stream = self.stream
+        if stream is not None and stream.effect == spec.name and stream.substeps == substeps:
+            volatile = self.effect_inputs(spec, effects.VOLATILE)
+            if all(stream.inputs.get(k) == v for k, v in volatile.items()): return stream
+        self.stream = batch.FrameStream(spec.name, self.effect_inputs(spec), speed, self.brightness_level(), substeps)
+        return self.stream
+
+    def fade_tick(self, now):
+        """Stream the running crossfade, one precomputed frame per tick"""
+        frame = self.crossfade.frame(now)
+        if frame is not None:
+            self.fade_frame = frame
+            self.ticker.mark(FADE_FRAME)
+        return self.crossfade.delay_ms()
+
+    def dithers(self):
+        """Whether the held frame needs dither phases at the current level"""
+        return self.dither_interval() is not None and self.held_frame is not None and self.dimmer.dithers(self.held_frame)
+
+    def arm_dither(self):
+        """A new held frame or level: wake the sleeping dither source if there is something to dither"""
+        if self.ticker.sleeping("dither") and self.dithers():
+            self.ticker.wake("dither")
+            self.wake()
+
+    def dither_tick(self, now):
+        """Keep cycling the dither phases of a held static frame; frames sent anyway advance them too"""
+        if not self.dithers(): return None
+        if not self.dithering(now):
+            # Held too long: send the rounded colours once, then nothing until a new frame
+            if self.dithering(self.held_since): self.ticker.mark(DITHER_FRAME)
+            return None
+        interval = self.dither_interval()
+        # Only fill gaps, so dithering never adds transfers on top of an animation or fade
+        if (now - self.held_since) * 1000 >= interval - self.ticker.SLACK_MS:
+            self.ticker.mark(DITHER_FRAME)
+        return interval
+
+    def battery_tick(self, now):
+        """Refresh the readout the Battery effect (and the gauge in layers) shows"""
+        self.battery = read_battery()
+        return 1000
+
+    # --- Loop ---
+
+    def call_soon(self, fn, *args):
+        """Run ``fn(*args)`` on the engine thread (safe to call from any thread)"""
+        self.calls.append((fn, args))
+        self.wake()
+
+    def run_calls(self):
+        while self.calls:
+            fn, args = self.calls.popleft()
+            fn(*args)
+
+    def run(self):
+        """Run sources and send frames until stop(); sleeps between deadlines"""
+        self.running = True
+        while self.running:
+            self.run_calls()
+            self.process(self.ticker.run())
+            delay = self.ticker.delay_ms()
+            self.wakeup.wait(None if delay is None else delay / 1000)
+            self.wakeup.clear()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def stats(self):
+        """Scheduler, timeline and controller counters for diagnostics"""
+        data = {**self.ticker.stats(), **self.timeline.stats(), **self.crossfade.stats()}
+        if self.controller: data.update(self.controller.stats())
+        return data
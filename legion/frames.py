@@ -0,0 +1,130 @@
+"""
+Frame encoder for the ITE 8295 keyboard light controller.
+
+The 33 byte payload layout is documented at the top of l5p-kbl/l5p_kbl.py.
+Everything except the 12 colour bytes depends only on effect, speed,
+brightness and wave direction, so those parts are built once per combination
+and cached as an immutable template. Encoding a frame is then a copy of the
+template plus one slice assignment per zone.
+"""
+
+import re
+from colorsys import hsv_to_rgb
+from functools import lru_cache
+
+FRAME_SIZE = 33
+HEADER = (0xCC, 0x16)
+EFFECT = {"static": 1, "breath": 3, "wave": 4, "hue": 6, "off": 1}
+# Effects whose frame carries per-zone colours
+COLOR_EFFECTS = ("static", "breath")
+ZONES = 4
+# Offset of the first colour byte (RED SECTION 1)
+COLOR_OFFSET = 5
+
+_HEX_RE = re.compile(r"^[0-9a-f]{6}$")
+_HSV_RE = re.compile(r"^\d+\.\d+$")
+
+
+def pack_rgb(r, g, b):
+    """Pack an (r, g, b) triple into a 0xRRGGBB integer"""
+    return (r << 16) | (g << 8) | b
+
+
+def unpack_rgb(color):
+    """Split a 0xRRGGBB integer into an (r, g, b) triple"""
+    return (color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF
+
+
+@lru_cache(maxsize=4096)
+def decode_color(color, lenient=False):
+    """Decode a HEX ("ff0000"), RGB ("255,0,0") or HSV ("0.0,1.0,1.0") string into 0xRRGGBB.
+
+    Results are memoized, so a colour string that repeats between frames is
+    only ever parsed once. ``lenient`` reads RGB the way the app always did
+    for saved profiles: components above 255 are clamped and any past the
+    third are ignored.
+    """
+    color = color.strip().lower().lstrip("#")
+
+    # HEX model
+    if _HEX_RE.match(color):
+        return int(color, 16)
+
+    components = [c.strip() for c in color.split(",")]
+    if lenient and len(components) >= 3 and all(c.isdigit() for c in components):
+        return pack_rgb(*(min(255, int(c)) for c in components[:3]))
+    if len(components) != 3:
+        raise ValueError(f"Invalid color model: {color}")
+
+    if all(c.isdigit() for c in components):
+        # RGB model
+        rgb = [int(c) for c in components]
+        if not all(0 <= c <= 255 for c in rgb):
+            raise ValueError(f"Invalid RGB color model: {color}")
+        return pack_rgb(*rgb)
+
+    if all(_HSV_RE.match(c) for c in components):
+        # HSV model
+        hsv = [float(c) for c in components]
+        if not all(0 <= c <= 1 for c in hsv):
+            raise ValueError(f"Invalid HSV color model: {color}")
+        return pack_rgb(*(int(c * 255) for c in hsv_to_rgb(*hsv)))
+
+    raise ValueError(f"Invalid color model: {color}")
+
+
+@lru_cache(maxsize=256)
+def frame_template(effect, speed=1, brightness=1, wave_direction=None):
+    """Return the cached frame for an effect with all colour bytes zeroed"""
+    data = bytearray(FRAME_SIZE)
+    data[0:2] = bytes(HEADER)
+    data[2] = EFFECT[effect]
+
+    if effect != "off":
+        data[3] = speed
+        data[4] = brightness
+
+        # Wave direction
+        wd = wave_direction.upper() if wave_direction else None
+        if wd == "RTL":
+            data[18] = 1
+        elif wd == "LTR":
+            data[19] = 1
+
+    return bytes(data)
+
+
+def encode_frame(effect, colors=None, speed=1, brightness=1, wave_direction=None):
+    """Build the 33 byte control frame.
+
+    ``colors`` may hold colour strings (see ``decode_color``) or packed
+    0xRRGGBB integers. Missing or blank entries repeat the previous zone's
+    colour, starting from black.
+    """
+    template = frame_template(effect, speed, brightness, wave_direction)
+    if effect not in COLOR_EFFECTS or not colors:
+        return template
+
+    data = bytearray(template)
+    packed = 0
+    count = len(colors)
+    for section in range(ZONES):
+        if section < count:
+            color = colors[section]
+            if isinstance(color, int):
+                packed = color
+            elif color and color.strip():
+                packed = decode_color(color)
+        offset = COLOR_OFFSET + section * 3
+        data[offset:offset + 3] = packed.to_bytes(3, "big")
+
+    return bytes(data)
+
+
+def decode_frame(frame):
+    """Split a control frame into (effect code, speed, brightness, [0xRRGGBB] * 4)"""
+    colors = [
+        int.from_bytes(frame[offset:offset + 3], "big")
+        for offset in range(COLOR_OFFSET, COLOR_OFFSET + ZONES * 3, 3)
+    ]
+    return frame[2], frame[3], frame[4], colors
@@ -0,0 +1,134 @@
+"""
+Device throughput probe and frame-rate governor.
+
+The probe streams an unchanging frame at the controller as fast as it accepts
+them and records per-transfer latency and the sustained frame rate. The result
+is cached per VENDOR/PRODUCT pair (and transport, for backends other than
+pyusb), so it only runs once per keyboard model.
+
+The governor turns that capability into a minimum tick interval. Software
+effects ask it to stretch their requested delay, which slows an animation down
+on a slow controller instead of piling transfers up behind it. While running
+it also follows the writer threads' live latency, so a controller that gets
+slower than it probed (USB autosuspend, a busy hub) is throttled as well. With
+several controllers attached the slowest one sets the pace.
+"""
+
+import json
+import math
+import os
+import time
+
+from legion.frames import frame_template
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "legion-controller")
+CAPS_PATH = os.path.join(CACHE_DIR, "device_caps.json")
+
+
+def caps_key(vendor, product, backend="pyusb"):
+    key = f"{vendor:04x}:{product:04x}"
+    return key if backend == "pyusb" else f"{key}/{backend}"
+
+
+def load_capability(vendor, product, path=CAPS_PATH, backend="pyusb"):
+    """Return the cached probe result for a device model, or None"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get(caps_key(vendor, product, backend))
+    except (OSError, ValueError):
+        return None
+
+
+def save_capability(vendor, product, caps, path=CAPS_PATH, backend="pyusb"):
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data[caps_key(vendor, product, backend)] = caps
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+    except OSError as e:
+        print(f"Could not save device capability: {e}")
+
+
+def probe_device(backend, frame, duration=1.0, max_frames=400, warmup=5):
+    """Measure sustained transfer latency and frame rate of a connected device.
+
+    Holds the backend lock for the whole run so the writer thread waits
+    instead of interleaving frames. Returns None if the device is unavailable.
+    """
+    latencies = []
+    with backend.lock:
+        if not backend.connected: return None
+        try:
+            for _ in range(warmup):
+                backend.transfer(frame)
+
+            start = time.perf_counter()
+            deadline = start + duration
+            while len(latencies) < max_frames and time.perf_counter() < deadline:
+                t0 = time.perf_counter()
+                backend.transfer(frame)
+                latencies.append(time.perf_counter() - t0)
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            print(f"Device probe failed: {e}")
+            return None
+
+    if not latencies: return None
+    latencies.sort()
+    return {
+        "frames": len(latencies),
+        "latency_p50_ms": latencies[len(latencies) // 2] * 1000,
+        "latency_p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "latency_max_ms": latencies[-1] * 1000,
+        "max_fps": len(latencies) / elapsed,
+        "probed_at": time.time(),
+    }
+
+
+def ensure_capability(controller, force=False, path=CAPS_PATH):
+    """Load the cached capability of the controller's device, probing it if needed"""
+    vendor, product, backend = controller.VENDOR, controller.PRODUCT, controller.backend
+    caps = None if force else load_capability(vendor, product, path, backend.name)
+    if caps is None:
+        # Repeat whatever the keyboard shows so the probe is not visible
+        frame = controller.last_frame or frame_template("static")
+        caps = probe_device(backend, frame)
+        if caps is not None and backend.persist_caps:
+            save_capability(vendor, product, caps, path, backend.name)
+    return caps
+
+
+class FrameGovernor:
+    # Fraction of the measured frame rate that effects may use
+    HEADROOM = 0.8
+    # Live latency includes reconnect backoff; don't let an outage freeze effects
+    LIVE_LIMIT_MS = 1000.0
+
+    def __init__(self, caps=None, writers=()):
+        self.writers = list(writers)
+        self.max_fps = None
+        self.update(caps)
+
+    def update(self, *caps):
+        """Adopt (new) probe results, one per controller; the slowest one wins"""
+        rates = [c["max_fps"] for c in caps if c and c.get("max_fps")]
+        if rates:
+            self.max_fps = min(rates) * self.HEADROOM
+
+    def min_interval_ms(self):
+        """Smallest tick interval the device can sustain right now"""
+        interval = 1000.0 / self.max_fps if self.max_fps else 0.0
+        for writer in self.writers:
+            if not writer.transfers: continue
+            live = min(writer.latency_ewma * 1000 / self.HEADROOM, self.LIVE_LIMIT_MS)
+            interval = max(interval, live)
+        return interval
+
+    def stretch(self, delay_ms):
+        """Return ``delay_ms``, lengthened if the device cannot keep up with it"""
+        return max(int(delay_ms), math.ceil(self.min_interval_ms()))
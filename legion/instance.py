@@ -0,0 +1,89 @@
+"""
+Single-instance handoff, run before the app's heavy imports.
+
+Legion_KBLight.py calls handoff() first thing, so a second launch (say from
+the desktop entry) hands "show" to the running instance and exits before
+Tk, PIL, pystray, pyusb or the colour picker are loaded. This module only
+imports the standard library and keeps the wire format of the control
+socket; legion.ipc builds the rest of the protocol on it.
+
+LEGION_KB_SOCKET names a different socket, for running a second set of
+instances side by side (benchmarks, testing).
+
+Abstract socket names have no file permissions, so any local user could
+bind ours first. Both ends check the other's uid (SO_PEERCRED) and only talk
+to a process of the same user.
+"""
+
+import json
+import os
+import socket
+import struct
+
+ADDRESS = "\0" + os.environ.get("LEGION_KB_SOCKET", f"legion-kblight-{os.getuid()}")
+HEADER = struct.Struct(">I")
+MAX_MESSAGE = 1 << 20
+# struct ucred: pid, uid, gid
+CREDENTIALS = struct.Struct("3i")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def peer_uid(sock):
+    """uid of the process at the other end of a connected Unix socket"""
+    pid, uid, gid = CREDENTIALS.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, CREDENTIALS.size))
+    return uid
+
+
+def check_peer(sock):
+    if peer_uid(sock) != os.getuid(): raise ProtocolError("Control socket peer belongs to another user")
+
+
+def send_message(sock, obj):
+    data = json.dumps(obj, separators=(",", ":")).encode()
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk: return None
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_message(sock):
+    """The next message, or None when the peer closed the connection"""
+    head = _recv_exact(sock, HEADER.size)
+    if head is None: return None
+    (size,) = HEADER.unpack(head)
+    if size > MAX_MESSAGE: raise ProtocolError(f"Message too large ({size} bytes)")
+    body = _recv_exact(sock, size)
+    if body is None: return None
+    try: return json.loads(body)
+    except ValueError as e: raise ProtocolError(f"Malformed message: {e}")
+
+
+def handoff(address=ADDRESS, timeout=1.0):
+    """Ask a running instance to show its window.
+
+    Returns (start, daemon): whether this process should start, and whether
+    the lighting daemon (which has no window) already drives the keyboard.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+        check_peer(sock)
+        send_message(sock, {"id": 1, "commands": [{"cmd": "show"}]})
+        reply = recv_message(sock)
+    except (OSError, ProtocolError):
+        return True, False # No existing instance found
+    finally:
+        sock.close()
+    if not reply or not reply.get("ok"): return True, False
+    if reply["results"][0].get("window"): return False, False # Existing instance found and notified
+    return True, True
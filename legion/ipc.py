@@ -0,0 +1,286 @@
+"""
+Local control protocol on an abstract-namespace Unix socket.
+
+Whoever drives the keyboard (the GUI, or legiond.py) serves ADDRESS. Every
+message is a 4-byte big-endian length followed by a UTF-8 JSON object (the
+framing is in legion.instance):
+
+    request  {"id": 7, "commands": [{"cmd": "set-effect", "effect": "Fire"},
+                                    {"cmd": "set-colors", "colors": ["ff0000", ...]}]}
+    reply    {"id": 7, "ok": true, "results": [null, null]}
+             {"id": 7, "ok": false, "error": "Unknown effect 'Fir'"}
+    event    {"event": "frame", "t": 1234.5, "frame": "cc1601..."}  (after subscribe-frames)
+
+Commands:
+
+    set-colors        colors: 1-4 colours, or zone: 0-3 and color
+    set-effect        effect, speed (1-4), brightness (Low/High), direction (LTR/RTL), level (0-100); all optional
+    load-profile      name
+    query-state       -> the settings, active colours and engine counters
+    subscribe-frames  every frame sent from now on arrives as an event on this connection
+    show              bring up the window -> {"window": true}, or false from the daemon
+
+All commands of one request are validated before any of them runs, then
+applied together and shown as a single frame. An abstract socket needs no
+file on disk and vanishes with its owner.
+"""
+
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+
+from legion.compositor import LAYERS
+from legion.effects import HARDWARE_EFFECTS, REGISTRY
+from legion.frames import decode_color
+# The wire format lives in the stdlib-only module the app runs before its heavy imports
+from legion.instance import ADDRESS, ProtocolError, check_peer, peer_uid, recv_message, send_message
+
+COMMANDS = ("set-colors", "set-effect", "load-profile", "query-state", "subscribe-frames", "show")
+# set-effect arguments -> profile keys (see LegionLightApp._get_current_settings_dict)
+EFFECT_FIELDS = {"effect": "effect", "speed": "speed", "brightness": "brightness", "direction": "wave_direction",
+                 "level": "level"}
+
+
+def _color(value):
+    try: return "%06x" % decode_color(str(value))
+    except ValueError as e: raise ProtocolError(str(e))
+
+
+def _choice(command, key, choices):
+    value = command[key]
+    if value not in choices: raise ProtocolError(f"Invalid {key} {value!r} (choose from {', '.join(map(str, choices))})")
+    return value
+
+
+def _integer(command, key, lo, hi):
+    value = command[key]
+    if not isinstance(value, int) or isinstance(value, bool) or not lo <= value <= hi:
+        raise ProtocolError(f"Invalid {key} {value!r} (expected {lo}-{hi})")
+    return value
+
+
+def validate(command):
+    """A normalized copy of one command; ProtocolError if it is not valid"""
+    if not isinstance(command, dict) or command.get("cmd") not in COMMANDS:
+        raise ProtocolError(f"Unknown command {command.get('cmd') if isinstance(command, dict) else command!r}")
+    cmd = command["cmd"]
+    out = {"cmd": cmd}
+    if cmd == "set-colors":
+        if "colors" in command:
+            colors = command["colors"]
+            if not isinstance(colors, list) or not 1 <= len(colors) <= 4: raise ProtocolError("colors: expected 1-4 colours")
+            out["colors"] = [_color(c) for c in colors]
+        elif "zone" in command and "color" in command:
+            out["zone"] = _integer(command, "zone", 0, 3)
+            out["color"] = _color(command["color"])
+        else:
+            raise ProtocolError("set-colors needs colors, or zone and color")
+    elif cmd == "set-effect":
+        if "effect" in command: out["effect"] = _choice(command, "effect", (*HARDWARE_EFFECTS, *REGISTRY, LAYERS))
+        if "speed" in command: out["speed"] = _integer(command, "speed", 1, 4)
+        if "brightness" in command: out["brightness"] = _choice(command, "brightness", ("Low", "High"))
+        if "direction" in command: out["direction"] = _choice(command, "direction", ("LTR", "RTL"))
+        if "level" in command: out["level"] = _integer(command, "level", 0, 100)
+    elif cmd == "load-profile":
+        if not isinstance(command.get("name"), str): raise ProtocolError("load-profile needs a name")
+        out["name"] = command["name"]
+    return out
+
+
+def merge(profile, command):
+    """Apply a validated set-colors or set-effect command to a profile dict"""
+    if command["cmd"] == "set-colors":
+        colors = list(profile.get("colors") or ["000000"] * 4)
+        if "colors" in command:
+            # Fewer than four colours repeat the last one, as in the frame encoder
+            given = command["colors"]
+            colors = [given[min(i, len(given) - 1)] for i in range(4)]
+        else:
+            colors[command["zone"]] = command["color"]
+        profile["colors"] = colors
+    elif command["cmd"] == "set-effect":
+        for arg, key in EFFECT_FIELDS.items():
+            if arg in command: profile[key] = command[arg]
+    return profile
+
+
+def call_in(schedule, fn, timeout=5.0):
+    """Run ``fn`` on another thread through ``schedule`` (e.g. LightingEngine.call_soon) and wait for its result"""
+    done = threading.Event()
+    box = {}
+
+    def run():
+        try: box["value"] = fn()
+        except Exception as e: box["error"] = e
+        finally: done.set()
+
+    schedule(run)
+    if not done.wait(timeout): raise ProtocolError("Timed out waiting for the lighting engine")
+    if "error" in box: raise box["error"]
+    return box["value"]
+
+
+class Subscriber:
+    """Frame events for one connection, sent from their own thread so a slow reader never blocks the engine"""
+    QUEUE = 256
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.queue = queue.Queue(self.QUEUE)
+        self.dropped = 0
+        self.stopped = False
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def put(self, event):
+        try: self.queue.put_nowait(event)
+        except queue.Full: self.dropped += 1
+
+    def stop(self):
+        """End the sender thread without ever blocking: the flag covers a full queue, the None an idle one"""
+        self.stopped = True
+        try: self.queue.put_nowait(None)
+        except queue.Full: pass
+
+    def run(self):
+        while True:
+            event = self.queue.get()
+            if event is None or self.stopped or not self.handler.send(event): return
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.lock = threading.Lock()
+        self.subscriber = None
+        # Only the user's own processes may control the keyboard
+        try: self.allowed = peer_uid(self.request) == os.getuid()
+        except OSError: self.allowed = False
+
+    def send(self, obj):
+        try:
+            with self.lock: send_message(self.request, obj)
+            return True
+        except OSError:
+            return False
+
+    def handle(self):
+        if not self.allowed: return
+        server = self.server.control
+        while True:
+            try:
+                message = recv_message(self.request)
+            except ProtocolError as e:
+                self.send({"ok": False, "error": str(e)})
+                return
+            except OSError:
+                return
+            if message is None: return
+            self.send(server.dispatch(message, self))
+
+    def finish(self):
+        if self.subscriber:
+            self.server.control.unsubscribe(self.subscriber)
+            self.subscriber.stop()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """Serves the protocol for ``execute(commands) -> results``, which applies a validated batch as one change"""
+
+    def __init__(self, execute, address=ADDRESS):
+        self.execute = execute
+        self.address = address
+        self.server = None
+        self.subscribers = []
+        self.requests = 0
+
+    def start(self):
+        """Listen in a background thread; False if another process already serves the address"""
+        try:
+            self.server = _Server(self.address, _Handler)
+        except OSError:
+            return False
+        self.server.control = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return True
+
+    def dispatch(self, message, handler):
+        reply = {"id": message.get("id")} if isinstance(message, dict) else {}
+        try:
+            commands = message.get("commands") if isinstance(message, dict) else None
+            if not isinstance(commands, list) or not commands: raise ProtocolError("Expected a non-empty commands list")
+            commands = [validate(c) for c in commands]
+            self.requests += 1
+            results = self.execute(commands)
+            if any(c["cmd"] == "subscribe-frames" for c in commands) and handler.subscriber is None:
+                handler.subscriber = Subscriber(handler)
+                self.subscribers.append(handler.subscriber)
+        except ProtocolError as e:
+            return {**reply, "ok": False, "error": str(e)}
+        except Exception as e:
+            return {**reply, "ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {**reply, "ok": True, "results": results}
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers: self.subscribers.remove(subscriber)
+
+    def publish(self, frame):
+        """Hand a sent frame to the subscribers (cheap: a queue put each)"""
+        if not self.subscribers: return
+        event = {"event": "frame", "t": time.monotonic(), "frame": bytes(frame).hex()}
+        for subscriber in list(self.subscribers):
+            subscriber.put(event)
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class Client:
+    """Blocking client: ``request(*commands)`` returns the results of one atomic batch"""
+
+    def __init__(self, address=ADDRESS, timeout=2.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(address)
+            check_peer(self.sock)
+        except (OSError, ProtocolError):
+            self.sock.close()
+            raise
+        self.next_id = 0
+
+    def request(self, *commands):
+        self.next_id += 1
+        send_message(self.sock, {"id": self.next_id, "commands": list(commands)})
+        while True:
+            reply = recv_message(self.sock)
+            if reply is None: raise ProtocolError("Connection closed by the server")
+            # Frame events of a subscription may arrive before the reply
+            if "event" in reply: continue
+            if not reply.get("ok"): raise ProtocolError(reply.get("error", "request failed"))
+            return reply["results"]
+
+    def events(self):
+        """Yield events (after subscribe-frames) until the server goes away"""
+        self.sock.settimeout(None)
+        while True:
+            message = recv_message(self.sock)
+            if message is None: return
+            if "event" in message: yield message
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,58 @@
+"""
+Deferred imports for the app's late and optional dependencies.
+
+lazy("pystray") stands in for a module and imports it on first attribute
+access, so startup only pays for what the first window needs. With REPORT
+set (Legion_KBLight.py --import-report) every deferred import prints its
+cost when it happens, in the spirit of python -X importtime. EAGER
+(LEGION_EAGER_IMPORTS=1) imports everything up front instead, to compare.
+"""
+
+import importlib
+import os
+import sys
+import time
+
+REPORT = False
+EAGER = bool(os.environ.get("LEGION_EAGER_IMPORTS"))
+# Every deferred module, in declaration order
+MODULES = []
+
+
+class LazyModule:
+    def __init__(self, name, path=None):
+        self._name = name
+        # Directory to put on sys.path first (modules vendored outside the package path)
+        self._path = path
+        self._module = None
+        # (seconds, modules imported, first user) once loaded
+        self._cost = None
+        MODULES.append(self)
+        if EAGER: self._load("startup")
+
+    def __getattr__(self, attr):
+        return getattr(self._load(sys._getframe(1).f_code.co_name), attr)
+
+    def _load(self, user):
+        if self._module is None:
+            if self._path and self._path not in sys.path: sys.path.insert(0, self._path)
+            before = len(sys.modules)
+            start = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            self._cost = (time.perf_counter() - start, len(sys.modules) - before, user)
+            if REPORT: print(report_line(self), file=sys.stderr, flush=True)
+        return self._module
+
+
+def lazy(name, path=None):
+    return LazyModule(name, path)
+
+
+def report_line(module):
+    seconds, count, user = module._cost
+    return f"deferred import: {seconds * 1e6:10.0f} us | {count:4d} modules | {module._name} (first used by {user})"
+
+
+def pending():
+    """Names of the deferred modules nobody has used yet"""
+    return [m._name for m in MODULES if m._module is None]
@@ -0,0 +1,79 @@
+"""
+Firmware offload: run a software effect as a hardware effect when that looks the same.
+
+Breath, wave and hue run on the keyboard at no host cost, while a software
+effect costs an evaluation and a USB transfer on every step. plan() looks at
+the active effect and its inputs. If a firmware effect stands in for it,
+plan() returns that effect as an Offload; the app then sends one frame and
+stops ticking the effect.
+
+* Heartbeat in one uniform colour: breath in that colour. This keeps the
+  colour but not the rhythm: breath fades instead of thumping, at a speed
+  picked by eye (the firmware's breath period has not been measured).
+* Soft Wave over the firmware's own rainbow: the firmware wave, in the same
+  direction. Soft Wave walks every zone through the colour list in order,
+  and the firmware wave walks every zone forward round the hue wheel, so
+  the hues must step forward a quarter turn per zone, starting at red as
+  the firmware's first frame does.
+* Layers where no layer animates: a single static frame.
+"""
+
+from colorsys import rgb_to_hsv
+
+from legion.frames import ZONES, decode_color, unpack_rgb
+
+# Largest deviation (degrees) of a zone from the firmware's rainbow
+HUE_TOLERANCE = 30
+# Hue (degrees) of the first zone's colour in the firmware wave's first frame
+WAVE_START_HUE = 0
+# Colours duller than this are not a rainbow
+MIN_SATURATION = 0.6
+MIN_VALUE = 0.5
+# Breath speed standing in for Heartbeat's 1.62 s cycle (chosen by eye, see above)
+HEARTBEAT_BREATH_SPEED = 3
+
+
+class Offload:
+    """A hardware frame standing in for a software effect"""
+
+    def __init__(self, effect, colors, speed, direction=None, reason=""):
+        self.effect = effect
+        self.colors = list(colors)
+        self.speed = speed
+        self.direction = direction
+        self.reason = reason
+
+    def __eq__(self, other):
+        return isinstance(other, Offload) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return f"Offload({self.effect!r}, {self.colors!r}, speed={self.speed}, direction={self.direction!r})"
+
+
+def hsv(color):
+    return rgb_to_hsv(*(c / 255 for c in unpack_rgb(decode_color(color))))
+
+
+def uniform(colors):
+    return len({decode_color(c) for c in colors}) == 1
+
+
+def rainbow(colors):
+    """Saturated colours at the firmware wave's hues: red first, then a quarter turn forward per zone"""
+    shades = [hsv(c) for c in colors]
+    if any(s < MIN_SATURATION or v < MIN_VALUE for _, s, v in shades): return False
+    step = 360 / ZONES
+    return all(abs((h * 360 - WAVE_START_HUE - step * i + 180) % 360 - 180) <= HUE_TOLERANCE
+               for i, (h, _, _) in enumerate(shades))
+
+
+def plan(effect, inputs, speed):
+    """The Offload for a software effect (a registered Effect or the compositor), or None"""
+    colors = inputs.get("colors")
+    if effect.name == "Heartbeat" and uniform(colors):
+        return Offload("breath", colors, HEARTBEAT_BREATH_SPEED, reason="uniform heartbeat")
+    if effect.name == "Soft Wave" and rainbow(colors):
+        return Offload("wave", colors, speed, inputs.get("direction", "LTR"), reason="rainbow wave")
+    if getattr(effect, "layers", None) is not None and not effect.animated:
+        return Offload("static", effect.evaluate(0, (), inputs), speed, reason="static layers")
+    return None
@@ -0,0 +1,87 @@
+"""
+One wakeup chain for every periodic job of the GUI.
+
+The selection blink, the software effect animation and the battery readout
+used to run as three independent ``after()`` chains, and each of them
+redrew the keyboard preview and could send a USB frame on its own. When
+they came due together that meant up to three renders and three transfers.
+
+Now every job is a source of the TickScheduler. A source runs when its
+deadline is reached, returns how long until it wants to run again, and marks
+what it changed as dirty flags. Sources that come due within SLACK_MS of each
+other share one wakeup. After a wakeup the owner turns the collected flags
+into at most one frame and one preview redraw.
+"""
+
+import math
+import time
+from collections import deque
+
+# Dirty flags
+PREVIEW = "preview"
+BLINK_FRAME = "blink-frame"
+EFFECT_FRAME = "effect-frame"
+FADE_FRAME = "fade-frame"
+DITHER_FRAME = "dither-frame"
+
+
+class TickScheduler:
+    # Sources due this close to a wakeup run in it instead of waking up again
+    SLACK_MS = 8
+    STATS_WINDOW = 5.0
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.sources = {}
+        self.dirty = set()
+        self.wakeups = deque()
+        self.runs = 0
+
+    def add(self, name, job, delay_ms=0):
+        """Register ``job(now)``, first due after ``delay_ms``.
+
+        The job returns the delay (ms) until its next run, or None to sleep until woken.
+        """
+        self.sources[name] = [self.clock() + delay_ms / 1000, job]
+
+    def wake(self, name):
+        """Make a source due now (it found new work outside its own schedule)"""
+        self.sources[name][0] = self.clock()
+
+    def sleeping(self, name):
+        """Whether a source returned None and waits for wake()"""
+        return self.sources[name][0] == math.inf
+
+    def mark(self, *flags):
+        self.dirty.update(flags)
+
+    def run(self, now=None):
+        """Run every source that is due and return the dirty flags they collected"""
+        if now is None: now = self.clock()
+        self.wakeups.append(now)
+        while self.wakeups[0] < now - self.STATS_WINDOW: self.wakeups.popleft()
+
+        horizon = now + self.SLACK_MS / 1000
+        for source in self.sources.values():
+            if source[0] <= horizon:
+                self.runs += 1
+                delay = source[1](now)
+                # Jobs return a delay measured after their own work (see Timeline.delay_ms)
+                source[0] = math.inf if delay is None else self.clock() + delay / 1000
+
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def delay_ms(self, now=None):
+        """Milliseconds until the next source is due, None if all of them sleep"""
+        if now is None: now = self.clock()
+        due = min((s[0] for s in self.sources.values()), default=math.inf)
+        if due == math.inf: return None
+        return max(0, math.ceil((due - now) * 1000))
+
+    def stats(self):
+        span = self.wakeups[-1] - self.wakeups[0] if len(self.wakeups) > 1 else 0
+        return {
+            "wakeups_per_s": (len(self.wakeups) - 1) / span if span else 0.0,
+            "source_runs": self.runs,
+        }
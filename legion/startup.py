@@ -0,0 +1,74 @@
+"""
+Startup as a dependency graph.
+
+Every stage names the stages it needs and runs as soon as they have
+finished, instead of after a guessed after() delay. A stage without a
+function is an event (say, the window's first paint) that its owner
+finishes with finish(). Each stage is timed from ``origin``; with REPORT set
+(Legion_KBLight.py --startup-report) the timings print as the stages
+finish, so a slow stage shows up by name.
+"""
+
+import sys
+import time
+
+REPORT = False
+
+
+class StartupGraph:
+    def __init__(self, origin=None, clock=time.perf_counter):
+        self.clock = clock
+        self.origin = clock() if origin is None else origin
+        self.stages = {}
+        self.done = set()
+        # name -> (start, duration) in ms since origin
+        self.timings = {}
+        self.started = False
+
+    def add(self, name, fn=None, needs=()):
+        if name in self.stages: raise ValueError(f"Duplicate startup stage '{name}'")
+        self.stages[name] = (fn, tuple(needs))
+
+    def start(self):
+        """Check the graph, then run every stage that is ready (and whatever those unblock)"""
+        for name, (fn, needs) in self.stages.items():
+            unknown = [n for n in needs if n not in self.stages]
+            if unknown: raise ValueError(f"Startup stage '{name}' needs unknown stage(s) {', '.join(unknown)}")
+        self.started = True
+        self.run_ready()
+
+    def finish(self, name):
+        """An event stage happened"""
+        if name in self.done: return
+        now = (self.clock() - self.origin) * 1000
+        self.record(name, now, 0.0)
+        if self.started: self.run_ready()
+
+    def run_ready(self):
+        progress = True
+        while progress:
+            progress = False
+            # Insertion order among the stages that are ready
+            for name, (fn, needs) in self.stages.items():
+                if fn is None or name in self.done or not all(n in self.done for n in needs): continue
+                start = self.clock()
+                try:
+                    fn()
+                except Exception as e:
+                    # A failed stage must not hold back the rest of startup
+                    print(f"Startup stage '{name}' failed: {e}", file=sys.stderr)
+                self.record(name, (start - self.origin) * 1000, (self.clock() - start) * 1000)
+                progress = True
+                break
+
+    def record(self, name, start_ms, duration_ms):
+        self.done.add(name)
+        self.timings[name] = (start_ms, duration_ms)
+        if REPORT: print(f"startup stage: {start_ms:8.1f} ms {duration_ms:+8.1f} ms  {name}", file=sys.stderr, flush=True)
+
+    @property
+    def complete(self):
+        return len(self.done) == len(self.stages)
+
+    def pending(self):
+        return [name for name in self.stages if name not in self.done]
@@ -0,0 +1,112 @@
+"""
+Deadline scheduler for software lighting effects.
+
+Re-arming a timer with a fixed delay after each frame adds the frame's own
+cost (encoding, USB transfer, preview render) to every period, so effects
+drift under load. The timeline instead places every step at a fixed offset
+from a ``time.monotonic()`` epoch and only ever reports how long to sleep
+until the next deadline. When a tick comes late the effect's policy decides
+what happens to the steps it missed:
+
+* ``skip``: jump straight to the step that is due now.
+* ``catch-up``: replay the missed steps back to back (up to MAX_CATCH_UP,
+  beyond that the timeline skips as well).
+
+How late each tick was is kept as jitter statistics.
+"""
+
+import bisect
+import math
+import time
+from collections import deque
+
+SKIP = "skip"
+CATCH_UP = "catch-up"
+
+
+def step_at(t, durations):
+    """Index of the step shown ``t`` seconds into a timeline of repeating ``durations`` (ms)"""
+    # Rounding keeps a step's own start time (a float) from landing in the previous step
+    cycles, offset = divmod(round(t * 1000, 6), sum(durations))
+    if len(durations) == 1: return int(cycles)
+    starts = [0]
+    for d in durations[:-1]: starts.append(starts[-1] + d)
+    return int(cycles) * len(durations) + bisect.bisect_right(starts, offset) - 1
+
+
+class Timeline:
+    # Missed steps replayed back to back before the timeline gives up and skips
+    MAX_CATCH_UP = 4
+    JITTER_WINDOW = 240
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.jitter = deque(maxlen=self.JITTER_WINDOW)
+        self.ticks = 0
+        self.frames_skipped = 0
+        self.start((100,))
+
+    def start(self, durations, policy=SKIP, now=None):
+        """Begin a new timeline of repeating step ``durations`` (ms), first step due now"""
+        self._set_durations(durations)
+        self.policy = policy
+        self.epoch = self.clock() if now is None else now
+        self.step = 0
+        self.current = 0
+
+    def retime(self, durations, now=None):
+        """Change the step durations without a jump: the pending step becomes due now"""
+        if tuple(durations) == self.durations: return
+        if now is None: now = self.clock()
+        self._set_durations(durations)
+        self.epoch = now - self.offset_ms(self.step) / 1000
+
+    def _set_durations(self, durations):
+        self.durations = tuple(durations)
+        self.cycle_ms = sum(self.durations)
+        self.starts = [0]
+        for d in self.durations[:-1]: self.starts.append(self.starts[-1] + d)
+
+    def offset_ms(self, step):
+        """Start of ``step`` in ms after the epoch"""
+        cycles, i = divmod(step, len(self.durations))
+        return cycles * self.cycle_ms + self.starts[i]
+
+    def deadline(self, step=None):
+        """Monotonic time at which ``step`` (default: the pending one) is due"""
+        return self.epoch + self.offset_ms(self.step if step is None else step) / 1000
+
+    def tick(self, now=None):
+        """Choose the step to render now (kept in ``current``) and return its time (s since the epoch).
+
+        The returned time is the step's nominal start, not the wall-clock
+        time of the tick, so a late frame still shows exactly its own step.
+        """
+        if now is None: now = self.clock()
+        self.jitter.append(abs(now - self.deadline()))
+        self.ticks += 1
+
+        step = self.step
+        due = step_at(now - self.epoch, self.durations)
+        if due > step and (self.policy == SKIP or due - step > self.MAX_CATCH_UP):
+            self.frames_skipped += due - step
+            step = due
+        self.current = step
+        self.step = step + 1
+        return self.offset_ms(step) / 1000
+
+    def delay_ms(self, now=None):
+        """Milliseconds until the pending step is due (0 if already late)"""
+        if now is None: now = self.clock()
+        return max(0, math.ceil((self.deadline() - now) * 1000))
+
+    def stats(self):
+        jitter = sorted(self.jitter)
+        n = len(jitter)
+        return {
+            "ticks": self.ticks,
+            "frames_skipped": self.frames_skipped,
+            "jitter_avg_ms": sum(jitter) / n * 1000 if n else 0.0,
+            "jitter_p95_ms": jitter[max(0, int(n * 0.95) - 1)] * 1000 if n else 0.0,
+            "jitter_max_ms": jitter[-1] * 1000 if n else 0.0,
+        }
@@ -0,0 +1,114 @@
+"""
+Crossfades between colour frames.
+
+A settings change used to jump on the keyboard. A Crossfade turns the jump
+into a short run of interpolated static frames instead. The whole run is
+generated in one batch when the fade starts (legion.batch.fade when NumPy is
+installed) and then handed out one frame per tick at the device's frame rate.
+
+A target that arrives mid-fade builds a new batch starting from the colours
+shown at that moment and keeps the running fade's deadline. A burst of
+changes therefore neither snaps back to the old colours nor keeps pushing
+the end of the fade out.
+
+Only static colour frames fade. Breath, wave and hue are animated by the
+firmware, so what they show is unknown; they are switched to directly.
+"""
+
+import math
+import time
+
+from legion import batch
+from legion.frames import COLOR_OFFSET, EFFECT, ZONES, decode_frame, encode_frame, unpack_rgb
+
+COLOR_END = COLOR_OFFSET + ZONES * 3
+
+
+def fadeable(frame):
+    """A static frame with a visible brightness"""
+    return frame is not None and frame[2] == EFFECT["static"] and frame[4] != 0
+
+
+def fade_frames(start, target, n):
+    """``n`` frames from just after ``start`` up to ``target``, with the target's speed and brightness"""
+    _, speed, brightness, end = decode_frame(target)
+    begin = decode_frame(start)[3]
+    if batch.available():
+        return batch.encode_frames(batch.fade(begin, end, n + 1)[1:], speed, brightness)
+    frames = []
+    for k in range(1, n + 1):
+        zones = [tuple(round(a + (b - a) * k / n) for a, b in zip(unpack_rgb(s), unpack_rgb(e))) for s, e in zip(begin, end)]
+        frames.append(encode_frame("static", ["%02x%02x%02x" % rgb for rgb in zones], speed, brightness))
+    return frames
+
+
+class Crossfade:
+    DEFAULT_MS = 300
+    # Frame interval when the device's rate is unknown (~60 fps)
+    TICK_MS = 16
+
+    def __init__(self, duration_ms=DEFAULT_MS, clock=time.monotonic):
+        self.duration_ms = duration_ms
+        self.clock = clock
+        # Last frame handed out or sent directly: where the next fade starts
+        self.shown = None
+        self.frames = []
+        self.index = -1
+        self.start = 0.0
+        self.interval = 0.0
+        self.deadline = 0.0
+        self.fades = 0
+        self.retargets = 0
+
+    @property
+    def active(self):
+        return bool(self.frames)
+
+    def show(self, frame):
+        """A frame went out without fading; any running fade is abandoned"""
+        self.frames = []
+        self.shown = frame
+
+    def fade_to(self, target, interval_ms, now=None):
+        """Start fading to ``target``, or retarget the running fade; False if it must be sent directly"""
+        if now is None: now = self.clock()
+        retarget = self.active
+        # Move ``shown`` to the colours of this instant
+        if retarget: self.frame(now)
+        current = self.shown
+        if not self.duration_ms or not (fadeable(current) and fadeable(target)): return False
+        if current[COLOR_OFFSET:COLOR_END] == target[COLOR_OFFSET:COLOR_END]: return False
+
+        remaining = (self.deadline - now) * 1000 if retarget else self.duration_ms
+        interval = max(interval_ms, self.TICK_MS)
+        n = max(1, math.ceil(remaining / interval))
+        self.frames = fade_frames(current, target, n)
+        self.index = -1
+        self.start = now
+        self.interval = interval / 1000
+        self.deadline = now + (n - 1) * self.interval
+        if retarget: self.retargets += 1
+        else: self.fades += 1
+        return True
+
+    def frame(self, now=None):
+        """The fade frame due at ``now``, or None if it was already handed out (or no fade runs)"""
+        if not self.frames: return None
+        if now is None: now = self.clock()
+        # (the epsilon keeps float error from dropping a frame that is due right now)
+        i = min(int((now - self.start) / self.interval + 1e-6), len(self.frames) - 1)
+        if i <= self.index: return None
+        frame = self.frames[i]
+        self.index = i
+        self.shown = frame
+        if i == len(self.frames) - 1: self.frames = []
+        return frame
+
+    def delay_ms(self, now=None):
+        """Milliseconds until the next fade frame is due, None when no fade runs"""
+        if not self.frames: return None
+        if now is None: now = self.clock()
+        return max(0, math.ceil((self.start + (self.index + 1) * self.interval - now) * 1000))
+
+    def stats(self):
+        return {"fades": self.fades, "fade_retargets": self.retargets}
@@ -0,0 +1,135 @@
+"""
+Background USB writer with a single-slot, latest-wins mailbox.
+
+Producers (Tk callbacks, animation ticks) post frames and return immediately.
+The writer thread is the only code that talks to the device. If a new frame is
+posted while an older one is still waiting, the older one is stale and is
+dropped instead of queued behind a slow transfer. Between frames the thread
+runs an optional ``idle`` job (the controller's resync and reconnect check).
+"""
+
+import threading
+import time
+
+
+class FrameWriter:
+    def __init__(self, transmit, name="legion-usb-writer", idle=None):
+        # transmit(frame, force) -> True if a transfer was made
+        self._transmit = transmit
+        # idle() -> seconds until it is due again (None: after the next frame), run while no frame waits
+        self._idle = idle
+        self._cond = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._closed = False
+
+        self.posted = 0
+        self.dropped = 0
+        self.transfers = 0
+        self.errors = 0
+        self.last_error = None
+        self.latency_last = 0.0
+        self.latency_max = 0.0
+        # Recent latency, weighted towards the last few transfers
+        self.latency_ewma = 0.0
+        self._latency_total = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def post(self, frame, force=False):
+        """Hand a frame to the writer thread, replacing any frame still waiting"""
+        with self._cond:
+            if self._closed: return
+            if self._pending is not None:
+                self.dropped += 1
+                # A superseded forced frame still forces its replacement
+                force = force or self._pending[1]
+            self._pending = (frame, force)
+            self.posted += 1
+            self._cond.notify()
+
+    def queue_depth(self):
+        """Frames waiting in the mailbox plus the one in flight (0-2)"""
+        with self._cond:
+            return (self._pending is not None) + self._busy
+
+    def flush(self, timeout=None):
+        """Block until the mailbox is empty and no transfer is in flight"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending is not None or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0: return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=1.0):
+        """Send whatever is pending, then stop the thread"""
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run_idle(self):
+        if self._idle is None: return None
+        try:
+            return self._idle()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = e
+            return None
+
+    def _run(self):
+        timeout = self._run_idle()
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    if not self._cond.wait(timeout): break
+                if self._pending is None and self._closed: return
+                job = self._pending
+                self._pending = None
+                self._busy = True
+
+            if job is None:
+                # Nothing was posted for ``timeout`` seconds
+                timeout = self._run_idle()
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+                continue
+
+            frame, force = job
+            start = time.perf_counter()
+            sent = False
+            try:
+                sent = self._transmit(frame, force)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+            elapsed = time.perf_counter() - start
+
+            with self._cond:
+                if sent:
+                    self.transfers += 1
+                    self.latency_last = elapsed
+                    self.latency_max = max(self.latency_max, elapsed)
+                    self.latency_ewma = elapsed if self.transfers == 1 else 0.8 * self.latency_ewma + 0.2 * elapsed
+                    self._latency_total += elapsed
+                self._busy = False
+                self._cond.notify_all()
+            timeout = self._run_idle()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": (self._pending is not None) + self._busy,
+                "frames_posted": self.posted,
+                "frames_dropped": self.dropped,
+                "transfer_errors": self.errors,
+                "latency_last_ms": self.latency_last * 1000,
+                "latency_avg_ms": self._latency_total / self.transfers * 1000 if self.transfers else 0.0,
+                "latency_max_ms": self.latency_max * 1000,
+                "latency_recent_ms": self.latency_ewma * 1000,
+            }
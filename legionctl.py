@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""Command line client of the Legion lighting control socket, see legion/ctl.py"""
+
+import sys
+
+from legion.ctl import main
+
+if __name__ == "__main__":
+    sys.exit(main())
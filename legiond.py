@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""Headless Legion lighting daemon, see legion/daemon.py"""
+
+import sys
+
+from legion.daemon import main
+
+if __name__ == "__main__":
+    sys.exit(main())